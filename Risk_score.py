@@ -1,5 +1,25 @@
 import os
-from transformers import pipeline
+from collections import defaultdict
+from metrics import stage
+from models import get_pipeline
+
+# Recordings longer than AUDIO_STREAMING_MIN_S are classified in overlapping
+# windows, AUDIO_WINDOW_BATCH at a time, so memory stays flat for long calls
+AUDIO_STREAMING_MIN_S = float(os.environ.get("AUDIO_STREAMING_MIN_S", "30"))
+AUDIO_WINDOW_S = float(os.environ.get("AUDIO_WINDOW_S", "10"))
+AUDIO_WINDOW_OVERLAP_S = float(os.environ.get("AUDIO_WINDOW_OVERLAP_S", "2"))
+AUDIO_WINDOW_BATCH = int(os.environ.get("AUDIO_WINDOW_BATCH", "8"))
+
+# Map audio emotion to our scoring system (0-35)
+EMOTION_MAPPING = {
+    'angry': 5,
+    'disgust': 5,
+    'fear': 10,
+    'happy': 30,
+    'neutral': 20,
+    'sad': 10,
+    'surprise': 25
+}
 
 def get_score(question, scale_info):
     while True:
@@ -25,34 +45,102 @@ def get_yes_no_score(question):
         else:
             print("❌ Invalid input. Please answer Yes or No.")
 
-def analyze_audio_sentiment(audio_file):
-    """Analyze audio file for sentiment using lightweight model"""
+def classify_audio_emotion(audio):
+    """Run the audio emotion model on a file path or a 16 kHz float32 buffer
+
+    Results are cached by audio fingerprint when AUDIO_CACHE_DB is set.
+    """
+    from audio import load_audio
+
+    samples = load_audio(audio) if isinstance(audio, str) else audio
+    return _classify_buffers([samples])[0]
+
+def _classify_buffers(buffers):
+    from audio import asr_input
+    from cache import memoize_audio
+
+    # Shared audio emotion pipeline (built once per process)
+    classifier = get_pipeline("audio_emotion")
+    def run(missing):
+        # Only equal-length buffers share a call: padding a shorter one (a
+        # recording's tail window) to the batch length would skew its scores
+        results = [None] * len(missing)
+        by_length = defaultdict(list)
+        for i, b in enumerate(missing):
+            by_length[len(b)].append(i)
+        with stage("audio_emotion"):
+            for group in by_length.values():
+                outputs = classifier([asr_input(missing[i]) for i in group], batch_size=len(group))
+                for i, output in zip(group, outputs):
+                    results[i] = output
+        return results
+    return memoize_audio("audio_emotion", buffers, run)
+
+def classify_audio_emotion_windows(audio, window_s=None, overlap_s=None, batch_size=None):
+    """Time-weighted emotion profile of a long recording, in classify_audio_emotion's result shape.
+
+    `audio` (a path or a 16 kHz buffer) is classified in overlapping windows,
+    `batch_size` at a time; each window's scores count for the new audio it
+    adds, so the profile is an average over time rather than over windows.
+    """
+    from audio import SAMPLE_RATE, iter_windows
+
+    window_s = window_s or AUDIO_WINDOW_S
+    overlap_s = AUDIO_WINDOW_OVERLAP_S if overlap_s is None else overlap_s
+    batch_size = batch_size or AUDIO_WINDOW_BATCH
+    if not 0 <= overlap_s < window_s:
+        raise ValueError("window overlap must be shorter than the window")
+
+    totals = defaultdict(float)
+    covered = 0.0
+    batch = []
+
+    def flush():
+        nonlocal covered
+        for (weight, _), results in zip(batch, _classify_buffers([b for _, b in batch])):
+            for r in results:
+                totals[r['label']] += weight * r['score']
+            covered += weight
+        batch.clear()
+
+    for start, samples in iter_windows(audio, window_s, overlap_s):
+        weight = len(samples) / SAMPLE_RATE - (overlap_s if start > 0 else 0.0)
+        if weight <= 0:
+            continue  # a tail already covered by the previous window's overlap
+        batch.append((weight, samples))
+        if len(batch) == batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if not covered:
+        raise ValueError("no audio to analyse")
+    profile = [{"label": label, "score": total / covered} for label, total in totals.items()]
+    return sorted(profile, key=lambda r: r['score'], reverse=True)
+
+def score_audio_emotion(results):
+    """Turn audio emotion results (highest score first) into the 0-35 mental score"""
+    # Get top emotion and score
+    top_emotion = results[0]['label']
+    emotion_score = results[0]['score']
+
+    # Calculate weighted score
+    mental_score = EMOTION_MAPPING.get(top_emotion.lower(), 15) * emotion_score
+    return min(35, max(0, mental_score))  # Ensure score is between 0-35
+
+def analyze_audio_sentiment(audio_file, streaming=None):
+    """Analyze audio file for sentiment using lightweight model
+
+    streaming=None picks windowed analysis for recordings longer than AUDIO_STREAMING_MIN_S.
+    """
+    from audio import duration
+
     try:
-        # Initialize sentiment analysis pipeline
-        classifier = pipeline("audio-classification", model="superb/hubert-base-superb-er")
-        
-        # Run analysis
-        results = classifier(audio_file)
-        
-        # Get top emotion and score
-        top_emotion = results[0]['label']
-        emotion_score = results[0]['score']
-        
-        # Map emotion to our scoring system (0-35)
-        emotion_mapping = {
-            'angry': 5,
-            'disgust': 5,
-            'fear': 10,
-            'happy': 30,
-            'neutral': 20,
-            'sad': 10,
-            'surprise': 25
-        }
-        
-        # Calculate weighted score
-        mental_score = emotion_mapping.get(top_emotion.lower(), 15) * emotion_score
-        return min(35, max(0, mental_score))  # Ensure score is between 0-35
-    
+        if streaming is None:
+            streaming = duration(audio_file) > AUDIO_STREAMING_MIN_S
+        if streaming:
+            return score_audio_emotion(classify_audio_emotion_windows(audio_file))
+        return score_audio_emotion(classify_audio_emotion(audio_file))
     except Exception as e:
         print(f"❌ Error analyzing audio: {e}")
         return 17.5  # Return neutral score if analysis fails
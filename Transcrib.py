@@ -1,42 +1,55 @@
-import os, time, wave
-import numpy as np
-import pygame
-import sounddevice as sd
-from gtts import gTTS
-from transformers import pipeline
+from metrics import stage
+from models import get_pipeline
 
-# Text-to-Speech
-def speak(text):
-    tts = gTTS(text, lang='en')
-    tts.save("speak.mp3")
-    pygame.mixer.init()
-    pygame.mixer.music.load("speak.mp3")
-    pygame.mixer.music.play()
-    while pygame.mixer.music.get_busy(): time.sleep(0.1)
-    pygame.mixer.quit()
-    os.remove("speak.mp3")
+PROMPTS = ["Please say something after the beep."]
 
-# Record microphone audio and save as WAV
-def record_audio(filename="speech.wav", duration=5, rate=44100):
+# Text-to-Speech (fixed prompts are played from the tts cache)
+def speak(text, cache=True):
+    import tts
+    tts.speak(text, cache=cache)
+
+# Record microphone audio and save as WAV, returning the file name as before;
+# in_memory=True returns the 16 kHz float32 buffer instead and writes no file
+def record_audio(filename="speech.wav", duration=5, rate=None, in_memory=False):
+    import capture
+    rate = rate or (capture.SAMPLE_RATE if in_memory else 44100)
     print("🎙️ Recording...")
-    data = sd.rec(int(duration * rate), samplerate=rate, channels=1, dtype='int16')
-    sd.wait()
-    with wave.open(filename, 'wb') as f:
-        f.setnchannels(1)
-        f.setsampwidth(2)
-        f.setframerate(rate)
-        f.writeframes(data.tobytes())
-    return filename
+    if capture.CAPTURE_MODE == "streaming" and rate == capture.SAMPLE_RATE:
+        data = capture.record_answer(duration)  # stops at the end of the answer
+    else:
+        import sounddevice as sd
+        with stage("record"):
+            data = sd.rec(int(duration * rate), samplerate=rate, channels=1, dtype='float32')
+            sd.wait()
+        data = data.reshape(-1)
+    if in_memory:
+        return data
+    from audio import write_wav
+    return write_wav(data, filename, rate)
 
-# Speech-to-Text using Whisper
-def transcribe(audio_file):
-    asr = pipeline("automatic-speech-recognition", model="openai/whisper-base", generate_kwargs={"language": "en"})
-    return asr(audio_file)['text'].strip()
+# Speech-to-Text using Whisper, from an audio file path or an in-memory 16 kHz buffer
+# (silence trimmed first; cached by audio fingerprint when AUDIO_CACHE_DB is set).
+# With ASR_STREAMING=1 long answers are transcribed in overlapping chunks instead,
+# a file being decoded one chunk at a time.
+def transcribe(audio):
+    from audio import asr_input, duration, load_audio
+    from cache import memoize_audio
+    from voice import ASR_CHUNK_S, ASR_STREAMING, transcribe_chunked, trim_answer
+    if ASR_STREAMING and duration(audio) > ASR_CHUNK_S:
+        return transcribe_chunked(audio)
+    samples, _ = trim_answer(load_audio(audio) if isinstance(audio, str) else audio)
+    if not len(samples):
+        return ""
+    asr = get_pipeline("whisper")
+    def run(buffers):
+        with stage("asr"):
+            return [asr(asr_input(b))['text'].strip() for b in buffers]
+    return memoize_audio("whisper", [samples], run)[0]
 
 # Demo
 if __name__ == "__main__":
-    speak("Please say something after the beep.")
-    file = record_audio()
-    text = transcribe(file)
+    speak(PROMPTS[0])
+    samples = record_audio(in_memory=True)
+    text = transcribe(samples)
     print("📝 You said:", text)
-    speak(f"You said: {text}")
+    speak(f"You said: {text}", cache=False)
@@ -1,54 +1,124 @@
+import logging
 import os
-import sounddevice as sd
-import numpy as np
-import wave
-from transformers import pipeline
-from gtts import gTTS
-import pygame
-import time
-
-def text_to_speech(text):
-    """Convert text to speech and play it"""
-    tts = gTTS(text=text, lang='en')
-    tts.save("temp_audio.mp3")
-    
-    pygame.mixer.init()
-    pygame.mixer.music.load("temp_audio.mp3")
-    pygame.mixer.music.play()
-    while pygame.mixer.music.get_busy():
-        time.sleep(0.1)
-    pygame.mixer.quit()
-    os.remove("temp_audio.mp3")
-
-def record_audio(duration=5, sample_rate=44100):
-    """Record audio from microphone"""
+from metrics import stage
+from models import get_pipeline
+import routing
+from session import InlineExecutor, analysis_executor
+
+logger = logging.getLogger(__name__)
+
+# Map emotion to score (1-5 for Likert scale)
+EMOTION_TO_LIKERT = {
+    'anger': 1,
+    'disgust': 1,
+    'fear': 2,
+    'joy': 5,
+    'neutral': 3,
+    'sadness': 2,
+    'surprise': 4
+}
+
+INTRO_PROMPTS = [
+    "\n🧠 Welcome to the Comprehensive Readiness Assessment",
+    "This assessment evaluates four key areas:",
+    "1. Physical Readiness (35 points)",
+    "2. Mental Readiness (35 points)",
+    "3. Certification Status (15 points)",
+    "4. Historical Behavior (15 points)",
+    "Total possible score: 100 points"
+]
+
+# Physical readiness questions (7 questions x 5 points each = 35 points)
+PHYSICAL_QUESTIONS = [
+    "1. I feel physically fit and ready to perform my tasks today.",
+    "2. I had restful sleep last night and feel refreshed.",
+    "3. I am free from any pain, discomfort, or illness at this moment.",
+    "4. I feel energetic and physically active.",
+    "5. I can perform my physical work without strain or fatigue.",
+    "6. My physical condition allows me to work at my full capacity.",
+    "7. I have no physical limitations that would affect my work today."
+]
+
+# Mental readiness questions (7 questions x 5 points each = 35 points)
+MENTAL_QUESTIONS = [
+    "8. I am feeling emotionally balanced and grounded.",
+    "9. I am mentally present, focused, and not distracted.",
+    "10. I feel emotionally stable and know how to manage my stress.",
+    "11. I am well-rested and not experiencing mental fatigue.",
+    "12. I recover quickly from emotional or mental setbacks.",
+    "13. I feel motivated and engaged with my work.",
+    "14. I can maintain concentration for extended periods when needed."
+]
+
+# Certification question (15 points)
+CERTIFICATION_QUESTION = "15. Have you completed all required certification courses for your current role?"
+
+# Historical behavior question (15 points)
+BEHAVIOR_QUESTION = "16. Do you have any past incidents of safety violations or concerning behavior?"
+
+PHYSICAL_HEADER = "Physical Readiness Questions 1 to 7"
+MENTAL_HEADER = "Mental Readiness Questions 8 to 14"
+
+# Every fixed prompt spoken in voice mode, for tts.prerender()
+VOICE_PROMPTS = (INTRO_PROMPTS + [PHYSICAL_HEADER] + PHYSICAL_QUESTIONS + [MENTAL_HEADER]
+                 + MENTAL_QUESTIONS + [CERTIFICATION_QUESTION, BEHAVIOR_QUESTION])
+
+def text_to_speech(text, cache=True):
+    """Convert text to speech and play it (fixed prompts come from the tts cache)"""
+    import tts
+
+    tts.speak(text, cache=cache)
+
+def record_audio(duration=5, sample_rate=16000):
+    """Record audio from microphone as a mono float32 buffer at Whisper's 16 kHz
+
+    With CAPTURE_MODE=streaming (the default) recording stops at the end of the
+    answer; `duration` is then the longest an answer may run.
+    """
+    import capture
+
+    if capture.CAPTURE_MODE == "streaming" and sample_rate == capture.SAMPLE_RATE:
+        print(f"Recording (up to {duration} seconds)...")
+        return capture.record_answer(duration)
+
+    import sounddevice as sd
+
     print(f"Recording for {duration} seconds...")
-    audio_data = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=1, dtype='int16')
-    sd.wait()  # Wait until recording is finished
-    return audio_data
+    with stage("record"):
+        audio_data = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=1, dtype='float32')
+        sd.wait()  # Wait until recording is finished
+    return audio_data.reshape(-1)  # (frames, 1) -> (frames,), a view
 
-def save_audio(audio_data, filename="temp.wav", sample_rate=44100):
+def save_audio(audio_data, filename="temp.wav", sample_rate=16000):
     """Save audio data to WAV file"""
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sample_rate)
-        wf.writeframes(audio_data.tobytes())
-    return filename
-
-def analyze_emotion_from_audio(audio_path):
-    """Analyze emotion from audio file path using Whisper + Emotion classifier"""
-    classifier = pipeline("text-classification", model="bhadresh-savani/distilbert-base-uncased-emotion", top_k=1)
-    speech_pipeline = pipeline("automatic-speech-recognition", model="openai/whisper-base", generate_kwargs={"language": "en"})
-
-    result = speech_pipeline(audio_path)
+    from audio import write_wav
+
+    return write_wav(audio_data, filename, sample_rate)
+
+def analyze_emotion_from_audio(audio):
+    """Analyze emotion from a 16 kHz float32 buffer (or an audio file path) using Whisper + Emotion classifier"""
+    from audio import asr_input
+    from voice import trim_answer
+
+    if not isinstance(audio, str):
+        audio, speech_ratio = trim_answer(audio)
+        if not len(audio):
+            logger.debug("No speech detected (speech ratio %.2f)", speech_ratio)
+            return "", "neutral"
+
+    classifier = get_pipeline("emotion")
+    speech_pipeline = get_pipeline("whisper")
+
+    with stage("asr"):
+        result = speech_pipeline(audio if isinstance(audio, str) else asr_input(audio))
     text = result['text'].strip()
-    print(f"Transcribed text: {text}")
+    logger.debug("Transcribed text: %s", text)
 
     top_emotion = "neutral"  # fallback
     if text:
-        emotion_result = classifier(text)
-        print(f"[DEBUG] Raw emotion_result: {emotion_result}")
+        with stage("emotion"):
+            emotion_result = classifier(text)
+        logger.debug("Raw emotion_result: %s", emotion_result)
 
         if isinstance(emotion_result, list):
             if isinstance(emotion_result[0], list) and len(emotion_result[0]) > 0:
@@ -56,32 +126,95 @@ def analyze_emotion_from_audio(audio_path):
             elif isinstance(emotion_result[0], dict):
                 top_emotion = emotion_result[0].get("label", "neutral")
 
-        print(f"Detected Emotion: {top_emotion}")
+        logger.debug("Detected Emotion: %s", top_emotion)
 
     return text, top_emotion
 # Removed erroneous check for undefined 'audio_path'
 
 
 
-def get_voice_response(question):
-    """Get voice response from user for a question"""
+def capture_voice_response(question):
+    """Ask a question aloud and record the spoken answer"""
     text_to_speech(question)
-    audio_data = record_audio()
-    audio_path = save_audio(audio_data)  # This returns 'temp.wav'
-    text, emotion = analyze_emotion_from_audio(audio_path)
+    return record_audio()
 
-    
-    # Map emotion to score (1-5 for Likert scale)
-    emotion_mapping = {
-        'anger': 1,
-        'disgust': 1,
-        'fear': 2,
-        'joy': 5,
-        'neutral': 3,
-        'sadness': 2,
-        'surprise': 4
-    }
-    return emotion_mapping.get(emotion, 3)
+def full_path_score(audio_data):
+    """(transcript, 1-5 score) through whisper-base and the emotion classifier"""
+    text, emotion = analyze_emotion_from_audio(audio_data)
+    return text, EMOTION_TO_LIKERT.get(emotion, 3)
+
+def score_voice_response(audio_data, kind=None):
+    """Score a recorded answer (1-5) from the emotion in its transcript
+
+    With ASR_ROUTING on, closed-form answers (kind routing.LIKERT or
+    routing.YES_NO) are scored from what was said instead, see routing.py.
+    """
+    return routing.score_answer(audio_data, kind, full_path_score)
+
+def score_voice_responses(audios, kinds=None):
+    """Batch version of score_voice_response: one Whisper batch and one classifier batch
+
+    Routed closed-form answers are scored one by one on whisper-tiny; the rest share the batch.
+    """
+    from voice import classify_emotions, transcribe_many
+
+    kinds = kinds or [None] * len(audios)
+    scores = [None] * len(audios)
+    if routing.ASR_ROUTING != "off":
+        for i, (audio_data, kind) in enumerate(zip(audios, kinds)):
+            if routing.is_closed(kind):
+                scores[i] = score_voice_response(audio_data, kind)
+
+    rest = [i for i, score in enumerate(scores) if score is None]
+    texts = transcribe_many([audios[i] for i in rest])
+    for i, emotion in zip(rest, classify_emotions(texts)):
+        scores[i] = EMOTION_TO_LIKERT.get(emotion, 3)
+    return scores
+
+def _live_asr(kind):
+    """True when an answer is transcribed while it is given (ASR_STREAMING=1, streaming capture, not routed)"""
+    import capture
+    import voice
+
+    routed = routing.ASR_ROUTING != "off" and routing.is_closed(kind)
+    return voice.ASR_STREAMING and capture.CAPTURE_MODE == "streaming" and not routed
+
+def live_voice_score(question):
+    """Ask a question aloud and score the answer while it is given
+
+    Whisper transcribes the answer chunk by chunk as it is recorded, and every
+    finished sentence is classified straight away; the answer's emotion is the
+    one with the most words behind it.
+    """
+    from collections import Counter
+    from voice import classify_emotions, transcribe_live
+
+    votes = Counter()
+
+    def on_sentences(sentences):
+        for sentence, emotion in zip(sentences, classify_emotions(sentences)):
+            votes[emotion] += len(sentence.split())
+
+    text_to_speech(question)
+    text, _ = transcribe_live(on_sentences=on_sentences)
+    emotion = votes.most_common(1)[0][0] if text and votes else "neutral"
+    return EMOTION_TO_LIKERT.get(emotion, 3)
+
+def get_voice_response(question, kind=None):
+    """Get voice response from user for a question"""
+    if _live_asr(kind):
+        return live_voice_score(question)
+    return score_voice_response(capture_voice_response(question), kind)
+
+def submit_voice_response(pool, question, kind=None):
+    """Record the answer now and hand its scoring to `pool`; returns a Future of the score
+
+    Answers transcribed live (ASR_STREAMING=1) are already scored when the
+    recording ends, so their Future is resolved on the spot.
+    """
+    if _live_asr(kind):
+        return InlineExecutor().submit(live_voice_score, question)
+    return pool.submit(score_voice_response, capture_voice_response(question), kind)
 
 def get_text_response(question, scale_info=None):
     """Get text response from user for a question"""
@@ -130,13 +263,17 @@ def readiness_scoring():
     }
     
     if voice_mode:
-        text_to_speech("\n🧠 Welcome to the Comprehensive Readiness Assessment")
-        text_to_speech("This assessment evaluates four key areas:")
-        text_to_speech("1. Physical Readiness (35 points)")
-        text_to_speech("2. Mental Readiness (35 points)")
-        text_to_speech("3. Certification Status (15 points)")
-        text_to_speech("4. Historical Behavior (15 points)")
-        text_to_speech("Total possible score: 100 points")
+        import tts
+        import warmup
+
+        # Whisper and the classifier load while the prompts render and the introduction plays
+        names = ["whisper", "emotion"] + ([routing.CLOSED_MODEL] if routing.ASR_ROUTING != "off" else [])
+        warm = warmup.start(names)
+        tts.prerender(VOICE_PROMPTS)
+        for prompt in INTRO_PROMPTS:
+            text_to_speech(prompt)
+        if warm:
+            print(warm.progress_line())
     else:
         print("\n🧠 Welcome to the Comprehensive Readiness Assessment\n")
         print("👉 This assessment evaluates four key areas:")
@@ -146,42 +283,29 @@ def readiness_scoring():
         print("4. Historical Behavior (15 points)\n")
         print("📊 Total possible score: 100 points\n")
 
-    # Physical readiness questions (7 questions x 5 points each = 35 points)
-    physical_questions = [
-        "1. I feel physically fit and ready to perform my tasks today.",
-        "2. I had restful sleep last night and feel refreshed.",
-        "3. I am free from any pain, discomfort, or illness at this moment.",
-        "4. I feel energetic and physically active.",
-        "5. I can perform my physical work without strain or fatigue.",
-        "6. My physical condition allows me to work at my full capacity.",
-        "7. I have no physical limitations that would affect my work today."
-    ]
-
-    # Text-based mental readiness questions (only used if audio not selected)
-    mental_questions = [
-        "8. I am feeling emotionally balanced and grounded.",
-        "9. I am mentally present, focused, and not distracted.",
-        "10. I feel emotionally stable and know how to manage my stress.",
-        "11. I am well-rested and not experiencing mental fatigue.",
-        "12. I recover quickly from emotional or mental setbacks.",
-        "13. I feel motivated and engaged with my work.",
-        "14. I can maintain concentration for extended periods when needed."
-    ]
-
-    # Certification question (15 points)
-    certification_question = "15. Have you completed all required certification courses for your current role?"
-
-    # Historical behavior question (15 points)
-    behavior_question = "16. Do you have any past incidents of safety violations or concerning behavior?"
+    physical_questions = PHYSICAL_QUESTIONS
+    mental_questions = MENTAL_QUESTIONS
+    certification_question = CERTIFICATION_QUESTION
+    behavior_question = BEHAVIOR_QUESTION
+
+    # Voice answers are recorded as each question is asked and scored by `pool`.
+    # With SESSION_MODE=pipelined scoring runs in the background while the next
+    # question is asked; with SESSION_MODE=deferred all answers are scored in one
+    # batch once the last one is recorded. Scores are collected after the last answer,
+    # except in the default sequential mode, where a scoring failure stops the
+    # session at the answer that caused it, as it did before.
+    pool = analysis_executor(batch_fn=score_voice_responses) if voice_mode else None
+
+    def ask(question, kind):
+        future = submit_voice_response(pool, question, kind)
+        if isinstance(pool, InlineExecutor):
+            future.result()
+        return future
 
     # Physical readiness assessment
     if voice_mode:
-        text_to_speech("Physical Readiness Questions 1 to 7")
-        physical_score = 0
-        for q in physical_questions:
-            score = get_voice_response(q)
-            physical_score += score * 1.0
-        physical_score = (physical_score / 35) * 35  # Scale to 35 points
+        text_to_speech(PHYSICAL_HEADER)
+        physical_futures = [ask(q, routing.LIKERT) for q in physical_questions]
     else:
         print("\n📝 Physical Readiness Questions (1-7)")
         physical_score = sum(get_text_response(q, likert_scale) for q in physical_questions) * 1.0
@@ -189,12 +313,8 @@ def readiness_scoring():
 
     # Mental readiness assessment
     if voice_mode:
-        text_to_speech("Mental Readiness Questions 8 to 14")
-        mental_score = 0
-        for q in mental_questions:
-            score = get_voice_response(q)
-            mental_score += score * 1.0
-        mental_score = (mental_score / 35) * 35
+        text_to_speech(MENTAL_HEADER)
+        mental_futures = [ask(q, routing.LIKERT) for q in mental_questions]
     else:
         print("\n📝 Mental Readiness Questions (8-14)")
         mental_score = sum(get_text_response(q, likert_scale) for q in mental_questions) * 1.0
@@ -202,20 +322,27 @@ def readiness_scoring():
 
     # Certification status
     if voice_mode:
-        cert_response = get_voice_response(certification_question)
-        certification_score = 15 if cert_response >= 4 else 0
+        cert_future = ask(certification_question, routing.YES_NO)
     else:
         print("\n📝 Certification Status (Question 15)")
         certification_score = get_text_response(certification_question)
 
     # Historical behavior
     if voice_mode:
-        behavior_response = get_voice_response(behavior_question)
-        behavior_score = 0 if behavior_response >= 4 else 15
+        behavior_future = ask(behavior_question, routing.YES_NO)
     else:
         print("\n📝 Historical Behavior (Question 16)")
         behavior_score = 15 - get_text_response(behavior_question)
 
+    if voice_mode:
+        pool.shutdown()  # waits for background scoring / runs the deferred batch
+        physical_score = sum(f.result() for f in physical_futures) * 1.0
+        physical_score = (physical_score / 35) * 35  # Scale to 35 points
+        mental_score = sum(f.result() for f in mental_futures) * 1.0
+        mental_score = (mental_score / 35) * 35
+        certification_score = 15 if cert_future.result() >= 4 else 0
+        behavior_score = 0 if behavior_future.result() >= 4 else 15
+
     total_score = physical_score + mental_score + certification_score + behavior_score
 
     # Scoring interpretation
@@ -233,12 +360,15 @@ def readiness_scoring():
 
     # Present results
     if voice_mode:
-        text_to_speech(f"Your Physical Readiness score is {physical_score:.1f} out of 35")
-        text_to_speech(f"Your Mental Readiness score is {mental_score:.1f} out of 35")
-        text_to_speech(f"Your Certification Status score is {certification_score} out of 15")
-        text_to_speech(f"Your Historical Behavior score is {behavior_score} out of 15")
-        text_to_speech(f"Your Total Readiness Score is {total_score:.1f} out of 100")
-        text_to_speech(f"Your Status is {interpret(total_score)}")
+        text_to_speech(f"Your Physical Readiness score is {physical_score:.1f} out of 35", cache=False)
+        text_to_speech(f"Your Mental Readiness score is {mental_score:.1f} out of 35", cache=False)
+        text_to_speech(f"Your Certification Status score is {certification_score} out of 15", cache=False)
+        text_to_speech(f"Your Historical Behavior score is {behavior_score} out of 15", cache=False)
+        text_to_speech(f"Your Total Readiness Score is {total_score:.1f} out of 100", cache=False)
+        text_to_speech(f"Your Status is {interpret(total_score)}", cache=False)
+        if routing.ASR_ROUTING != "off":
+            print("\n🔀 Answer routing:")
+            routing.print_summary()
     else:
         print("\n📊 Readiness Summary:")
         print(f"🔹 Physical Readiness: {physical_score:.1f}/35")
@@ -260,6 +390,7 @@ def readiness_scoring():
             print("- Historical behavior flagged. Additional review may be needed.")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
     try:
         readiness_scoring()
     except Exception as e:
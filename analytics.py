@@ -0,0 +1,354 @@
+# analytics.py
+"""Site-wide analytics over many stored assessment sessions.
+
+Sessions come from the columnar store speech.py appends to (store.py), or
+from JSON-lines files with one session per line (see save_session).
+load_matrix() turns them into dense NumPy arrays, sessions × questions ×
+labels for the 28 go-emotion and 6 toxic-bert scores, and the readiness,
+moderation and sentiment aggregates are computed on whole arrays at once
+rather than session by session.
+
+    python analytics.py                          # today's dashboard, one row per worker
+    python analytics.py --by team --days 7
+    python analytics.py --all --by day --json dashboard.json
+    python analytics.py exported_sessions.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from config import WORKER_TEAM
+from moderation import TOXIC_LABELS
+from sentiment import GO_EMOTION_LABELS, NEGATIVE_EMOTIONS, POSITIVE_EMOTIONS
+
+SESSIONS_FILE = os.environ.get("SESSIONS_FILE", "sessions.jsonl")
+
+MODERATION_THRESH = 0.01  # same default as the per-session sentiment report
+READINESS_BANDS = (50, 75)  # red below 50, amber below 75, green otherwise
+NO_TEAM = "unassigned"
+
+_NEUTRAL = GO_EMOTION_LABELS.index("neutral")
+_POSITIVE = np.array([label in POSITIVE_EMOTIONS for label in GO_EMOTION_LABELS])
+_NEGATIVE = np.array([label in NEGATIVE_EMOTIONS for label in GO_EMOTION_LABELS])
+
+
+def save_session(responses, user_id="User001", team=None, path=None):
+    """Append one finished session (the analysed answers) to the sessions file."""
+    record = {
+        "worker": user_id,
+        "team": team or WORKER_TEAM,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "responses": [{
+            "question": r["question"],
+            "answer": r["answer"],
+            "emotion": r.get("emotion"),
+            "sentiment": r.get("sentiment") or {},
+            "moderation": r.get("moderation") or {},
+            "moderation_status": r.get("moderation_status"),
+        } for r in responses if r],
+    }
+    with open(path or SESSIONS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def iter_sessions(paths, since=None, until=None):
+    """Session records from JSONL files, optionally limited to days in [since, until]."""
+    since = since and since.isoformat()
+    until = until and until.isoformat()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                day = record["time"][:10]
+                if (since and day < since) or (until and day > until):
+                    continue
+                yield record
+
+
+class SessionMatrix:
+    """Dense arrays for n sessions over the q distinct questions asked.
+
+    sentiment   float32 (n, q, 28)  go-emotion scores in percent, NaN where unanswered
+    moderation  float32 (n, q, 6)   toxic-bert probabilities, NaN where unanswered
+    answered    bool    (n, q)
+    worker, team        object (n,)
+    day                 datetime64[D] (n,)
+    questions           the q question texts, in order of first appearance
+    """
+
+    def __init__(self, records):
+        records = list(records)
+        questions = {}
+        for record in records:
+            for r in record["responses"]:
+                questions.setdefault(r["question"], len(questions))
+
+        n, q = len(records), len(questions)
+        self.questions = list(questions)
+        self.sentiment = np.full((n, q, len(GO_EMOTION_LABELS)), np.nan, dtype=np.float32)
+        self.moderation = np.full((n, q, len(TOXIC_LABELS)), np.nan, dtype=np.float32)
+        self.worker = np.array([r["worker"] for r in records], dtype=object)
+        self.team = np.array([r.get("team") or NO_TEAM for r in records], dtype=object)
+        self.day = np.array([r["time"][:10] for r in records], dtype="datetime64[D]")
+
+        for i, record in enumerate(records):
+            for r in record["responses"]:
+                j = questions[r["question"]]
+                sentiment, moderation = r.get("sentiment") or {}, r.get("moderation") or {}
+                # A failed classifier leaves an empty dict: count the answer, with zero scores
+                self.sentiment[i, j] = [sentiment.get(label, 0.0) for label in GO_EMOTION_LABELS]
+                self.moderation[i, j] = [moderation.get(label, 0.0) for label in TOXIC_LABELS]
+        self.answered = ~np.isnan(self.sentiment[..., 0])
+        self.references = None  # JSONL records do not keep the baseline each session was scored against
+
+    @classmethod
+    def from_store(cls, store, since=None, until=None):
+        """Arrays for the stored sessions in [since, until], gathered straight from the memmaps."""
+        sessions = store.sessions()[store.query(since=since, until=until)]
+        counts = sessions["n_answers"].astype(np.int64)
+        offsets = np.cumsum(counts) - counts
+        rows = np.repeat(sessions["first_answer"] - offsets, counts) + np.arange(counts.sum())
+        answers = store.answers()[rows]
+        session_of = np.repeat(np.arange(len(sessions)), counts)
+
+        m = cls.__new__(cls)
+        m.questions = store.questions
+        shape = (len(sessions), len(m.questions))
+        m.sentiment = np.full(shape + (len(GO_EMOTION_LABELS),), np.nan, dtype=np.float32)
+        m.moderation = np.full(shape + (len(TOXIC_LABELS),), np.nan, dtype=np.float32)
+        m.sentiment[session_of, answers["question"]] = answers["sentiment"]
+        m.moderation[session_of, answers["question"]] = answers["moderation"]
+        m.worker = np.char.decode(sessions["worker"], "utf-8").astype(object)
+        teams = np.char.decode(sessions["team"], "utf-8").astype(object)
+        m.team = np.where(teams == "", NO_TEAM, teams)
+        m.day = sessions["day"].astype("datetime64[D]")
+        m.answered = ~np.isnan(m.sentiment[..., 0])
+        m.references = cls._stored_references(sessions)
+        return m
+
+    @staticmethod
+    def _stored_references(sessions):
+        """Per-session (pos_mean, pos_std, neg_mean, neg_std) from the baseline each session was scored against.
+
+        Sessions that were scored within the session (baseline_n 0) get NaN.
+        """
+        n = sessions["baseline_n"].astype(np.float64)
+        stats = sessions["baseline"].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.where(n[:, None] > 1, np.sqrt(stats[:, [1, 3]] / (n[:, None] - 1)), 0.0)
+        refs = np.stack([stats[:, 0], std[:, 0], stats[:, 2], std[:, 1]])
+        refs[:, n == 0] = np.nan
+        return tuple(refs)
+
+    def __len__(self):
+        return len(self.worker)
+
+
+def load_matrix(paths=None, since=None, until=None):
+    """Sessions from a store directory (default STORE_DIR) or from JSON-lines files."""
+    from store import STORE_DIR, SessionStore
+
+    paths = paths or [STORE_DIR]
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        return SessionMatrix.from_store(SessionStore(paths[0]), since, until)
+    return SessionMatrix(iter_sessions(paths, since, until))
+
+
+def top3_scores(sentiment):
+    """Positive and negative score per answer from its top three non-neutral labels, shape (n, q)."""
+    scores = np.nan_to_num(sentiment.astype(np.float64))
+    ranked = scores.copy()
+    ranked[..., _NEUTRAL] = -np.inf
+    top = np.argsort(-ranked, axis=-1, kind="stable")[..., :3]
+    top_scores = np.take_along_axis(scores, top, axis=-1)
+    return (top_scores * _POSITIVE[top]).sum(-1), (top_scores * _NEGATIVE[top]).sum(-1)
+
+
+def readiness(m, references=None):
+    """Readiness score per session, the same formula as speech.compute_readiness; NaN if nothing was answered.
+
+    `references` is an optional (pos_mean, pos_std, neg_mean, neg_std) tuple of
+    per-session arrays (SessionMatrix.references or baselines.reference_arrays); sessions with a NaN
+    reference are z-scored within the session as usual.
+    """
+    pos, neg = top3_scores(m.sentiment)
+    mask = m.answered
+    count = mask.sum(1)
+    if references is None:
+        references = (np.full(len(m), np.nan),) * 4
+    pos_mean, pos_std, neg_mean, neg_std = references
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        def z_scores(values, ref_mean, ref_std):
+            own_mean = (values * mask).sum(1) / count
+            own_dev = (values - own_mean[:, None]) * mask
+            own_std = np.where(count > 1, np.sqrt((own_dev ** 2).sum(1) / (count - 1)), 1.0)
+            has_ref = ~np.isnan(ref_mean)
+            mean = np.where(has_ref, ref_mean, own_mean)
+            std = np.where(has_ref, ref_std, own_std)
+            std[std == 0] = 1.0
+            return (values - mean[:, None]) * mask / std[:, None]
+
+        pos_z, neg_z = z_scores(pos, pos_mean, pos_std), z_scores(neg, neg_mean, neg_std)
+        avg_pos_z = np.where(pos_z > 0, pos_z, 0).sum(1) / count
+        avg_neg_z = np.where(neg_z < 0, neg_z, 0).sum(1) / count
+    scores = np.clip(50 + avg_pos_z * 10 + avg_neg_z * 10, 0, 100).round(2)
+    return np.where(count > 0, scores, np.nan)
+
+
+def flagged_answers(m, thresh=MODERATION_THRESH):
+    """(n, q) mask of answered questions with any toxic-bert label at or above `thresh`."""
+    return m.answered & (np.nan_to_num(m.moderation).max(-1) >= thresh)
+
+
+def readiness_band(scores):
+    """0 red, 1 amber, 2 green for each score (NaN counts as red)."""
+    return np.digitize(np.nan_to_num(scores, nan=0.0), READINESS_BANDS)
+
+
+def top_sentiments(label_means, k=3):
+    """The k strongest non-neutral (label, mean score) pairs from one row of label means."""
+    order = [i for i in np.argsort(-label_means, kind="stable") if i != _NEUTRAL][:k]
+    return [(GO_EMOTION_LABELS[i], round(float(label_means[i]), 2)) for i in order]
+
+
+def distribution(scores):
+    """Percentiles and status counts of a set of readiness scores."""
+    scores = scores[~np.isnan(scores)]
+    if not len(scores):
+        return {"sessions": 0}
+    p10, p25, p50, p75, p90 = np.percentile(scores, [10, 25, 50, 75, 90])
+    red, amber, green = np.bincount(readiness_band(scores), minlength=3)
+    return {
+        "sessions": int(len(scores)), "mean": round(float(scores.mean()), 2),
+        "p10": round(float(p10), 2), "p25": round(float(p25), 2), "median": round(float(p50), 2),
+        "p75": round(float(p75), 2), "p90": round(float(p90), 2),
+        "red": int(red), "amber": int(amber), "green": int(green),
+    }
+
+
+def aggregate(m, by="worker", moderation_thresh=MODERATION_THRESH, scores=None):
+    """One summary row per worker, team or day, lowest mean readiness first."""
+    keys = m.day.astype(str) if by == "day" else getattr(m, by)
+    groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+    g = len(groups)
+    scores = readiness(m) if scores is None else scores
+    valid = ~np.isnan(scores)
+
+    sessions = np.bincount(inverse, minlength=g)
+    scored = np.bincount(inverse, weights=valid, minlength=g)
+    readiness_sum = np.bincount(inverse, weights=np.where(valid, scores, 0), minlength=g)
+    readiness_min = np.full(g, np.inf)
+    np.minimum.at(readiness_min, inverse, np.where(valid, scores, np.inf))
+    bands = np.bincount(inverse * 3 + readiness_band(scores), minlength=g * 3).reshape(g, 3)
+
+    answers = np.bincount(inverse, weights=m.answered.sum(1), minlength=g)
+    flagged = np.bincount(inverse, weights=flagged_answers(m, moderation_thresh).sum(1), minlength=g)
+    label_sums = np.zeros((g, len(GO_EMOTION_LABELS)))
+    np.add.at(label_sums, inverse, np.nansum(m.sentiment, axis=1))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        readiness_mean = readiness_sum / scored
+        flag_rate = flagged / answers
+        label_means = label_sums / answers[:, None]
+
+    rows = [{
+        by: str(groups[i]),
+        "sessions": int(sessions[i]),
+        "readiness_mean": None if np.isnan(readiness_mean[i]) else round(float(readiness_mean[i]), 2),
+        "readiness_min": None if np.isinf(readiness_min[i]) else round(float(readiness_min[i]), 2),
+        "red": int(bands[i, 0]), "amber": int(bands[i, 1]), "green": int(bands[i, 2]),
+        "answers": int(answers[i]),
+        "moderation_rate": None if np.isnan(flag_rate[i]) else round(float(flag_rate[i]), 4),
+        "top_sentiments": [] if not answers[i] else top_sentiments(label_means[i]),
+    } for i in range(g)]
+    return sorted(rows, key=lambda r: (r["readiness_mean"] is not None, r["readiness_mean"] or 0))
+
+
+def dashboard(m, by="worker", moderation_thresh=MODERATION_THRESH, references=None):
+    """Site-wide summary plus per-group rows, ready for json.dump."""
+    scores = readiness(m, references)
+    answers = int(m.answered.sum())
+    flagged = int(flagged_answers(m, moderation_thresh).sum())
+    site_means = np.nansum(m.sentiment, axis=(0, 1)) / max(answers, 1)
+    return {
+        "sessions": len(m),
+        "workers": int(len(np.unique(m.worker.astype(str)))),
+        "days": sorted(set(m.day.astype(str))),
+        "readiness": distribution(scores),
+        "answers": answers,
+        "flagged_answers": flagged,
+        "moderation_rate": round(flagged / answers, 4) if answers else None,
+        "top_sentiments": top_sentiments(site_means) if answers else [],
+        "by": by,
+        "groups": aggregate(m, by, moderation_thresh, scores),
+    }
+
+
+def print_dashboard(d, moderation_thresh=MODERATION_THRESH, limit=20):
+    days = d["days"]
+    period = days[0] if len(days) == 1 else f"{days[0]} → {days[-1]}" if days else "no data"
+    print(f"📊 Site dashboard ({period}): {d['sessions']} sessions from {d['workers']} workers")
+    if not d["sessions"]:
+        return
+    r = d["readiness"]
+    print(f"🟢 {r['green']}  🟡 {r['amber']}  🔴 {r['red']}   readiness median {r['median']:.1f} "
+          f"(p10 {r['p10']:.1f}, p90 {r['p90']:.1f})")
+    print(f"🛡️ {d['flagged_answers']}/{d['answers']} answers flagged (>{moderation_thresh})")
+    print("🔝 Top sentiments: " + ", ".join(f"{label} {score:.1f}" for label, score in d["top_sentiments"]))
+
+    by = d["by"]
+    print(f"\n{by:<16} {'sessions':>8} {'mean':>7} {'min':>7} {'🔴':>3} {'flagged':>8}  top sentiments")
+    for row in d["groups"][:limit]:
+        mean = "-" if row["readiness_mean"] is None else f"{row['readiness_mean']:.1f}"
+        low = "-" if row["readiness_min"] is None else f"{row['readiness_min']:.1f}"
+        rate = "-" if row["moderation_rate"] is None else f"{row['moderation_rate']:.0%}"
+        tops = ", ".join(label for label, _ in row["top_sentiments"])
+        print(f"{row[by]:<16} {row['sessions']:>8} {mean:>7} {low:>7} {row['red']:>3} {rate:>8}  {tops}")
+    if len(d["groups"]) > limit:
+        print(f"... {len(d['groups']) - limit} more (use --limit or --json)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate stored sessions into a site dashboard.")
+    parser.add_argument("paths", nargs="*", help="session store directory or JSONL files (default: STORE_DIR)")
+    parser.add_argument("--by", choices=["worker", "team", "day"], default="worker")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="last day to include")
+    parser.add_argument("--days", type=int, default=1, help="number of days up to --date")
+    parser.add_argument("--all", action="store_true", help="ignore --date/--days and use every session")
+    parser.add_argument("--moderation-thresh", type=float, default=MODERATION_THRESH)
+    parser.add_argument("--baselines", action="store_true",
+                        help="score each session against the worker baseline it was scored against "
+                             "when it was stored (needs a session store; see baselines.py)")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print")
+    parser.add_argument("--json", help="write the dashboard to this file")
+    args = parser.parse_args()
+
+    since = until = None
+    if not args.all:
+        since, until = args.date - timedelta(days=args.days - 1), args.date
+    m = load_matrix(args.paths, since, until)
+    references = None
+    if args.baselines:
+        # Each session's own baseline, not today's: a worker's history keeps moving
+        if m.references is None:
+            parser.error("--baselines needs a session store: JSONL sessions do not record their baseline")
+        references = m.references
+    d = dashboard(m, args.by, args.moderation_thresh, references)
+    print_dashboard(d, args.moderation_thresh, args.limit)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(d, f, indent=2, ensure_ascii=False)
+        print(f"\n📁 Dashboard saved as: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+# audio.py
+"""Audio buffers as the ASR stage wants them: mono float32 at 16 kHz, in memory."""
+import os
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000  # Whisper and HuBERT are both trained on 16 kHz audio
+
+# Energy-based voice activity detection in front of ASR (VAD=0 turns it off)
+VAD_ENABLED = os.environ.get("VAD", "1") != "0"
+VAD_FRAME_MS = 30
+# Frames quieter than this are never speech. Only digital silence by default: the
+# real threshold comes from each recording's own noise floor and peak, so a quiet
+# or low-gain microphone is not mistaken for no answer
+VAD_FLOOR_DB = float(os.environ.get("VAD_FLOOR_DB", "-100"))
+VAD_RANGE_DB = 30.0       # speech frames are within this of the recording's loudest frame
+VAD_MARGIN_DB = 10.0      # speech must be this far above the estimated noise floor
+VAD_PAD_MS = 200          # silence kept around detected speech, so word edges are not clipped
+VAD_MIN_SPEECH_MS = float(os.environ.get("VAD_MIN_SPEECH_MS", "150"))  # less than this counts as no answer
+
+
+def pcm16_to_float32(pcm):
+    """Little-endian int16 PCM bytes (or array) to float32 in [-1, 1), one allocation."""
+    samples = np.frombuffer(pcm, dtype=np.int16) if isinstance(pcm, (bytes, bytearray, memoryview)) else pcm
+    return np.multiply(samples, 1.0 / 32768, dtype=np.float32)
+
+
+def resample(samples, orig_sr, target_sr=SAMPLE_RATE):
+    """Linear-interpolation resampler; returns `samples` unchanged when rates already match."""
+    if orig_sr == target_sr or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * target_sr / orig_sr))
+    positions = np.arange(n_out, dtype=np.float64) * (orig_sr / target_sr)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def to_mono_float32(samples):
+    """Flatten a (frames, channels) capture buffer to mono float32 without copying when possible."""
+    samples = np.asarray(samples)
+    if samples.ndim == 2:
+        samples = samples[:, 0] if samples.shape[1] == 1 else samples.mean(axis=1)
+    if samples.dtype == np.int16:
+        return pcm16_to_float32(samples)
+    return samples.astype(np.float32, copy=False)
+
+
+def from_audio_data(audio_data):
+    """speech_recognition.AudioData to a 16 kHz float32 buffer (resampled once, by the library)."""
+    return pcm16_to_float32(audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+
+
+def asr_input(samples, sampling_rate=SAMPLE_RATE):
+    """Wrap a buffer in the dict form transformers audio pipelines accept instead of a file path."""
+    return {"raw": samples, "sampling_rate": sampling_rate}
+
+
+def load_audio(path):
+    """Decode an audio file (WAV, FLAC, OGG, ...) to 16 kHz mono float32; `path` may be a file object."""
+    import soundfile as sf
+
+    samples, rate = sf.read(path, dtype="float32", always_2d=True)
+    return resample(to_mono_float32(samples), rate)
+
+
+def duration(source):
+    """Length in seconds of an audio file (read from its header) or of a 16 kHz buffer."""
+    if isinstance(source, str):
+        import soundfile as sf
+        return sf.info(source).duration
+    return len(source) / SAMPLE_RATE
+
+
+def iter_windows(source, window_s, overlap_s=0.0):
+    """(start_s, samples) windows of `window_s` seconds, each overlapping the previous by `overlap_s`.
+
+    `source` is a 16 kHz buffer (windows are views, nothing is copied) or a file
+    path, decoded one window at a time so memory does not grow with its length.
+    """
+    if not isinstance(source, str):
+        window = int(window_s * SAMPLE_RATE)
+        overlap = int(overlap_s * SAMPLE_RATE)
+        for start in range(0, max(len(source) - overlap, 1), window - overlap):
+            yield start / SAMPLE_RATE, source[start:start + window]
+        return
+
+    import soundfile as sf
+
+    rate = sf.info(source).samplerate
+    window, overlap = int(round(window_s * rate)), int(round(overlap_s * rate))
+    start = 0
+    for block in sf.blocks(source, blocksize=window, overlap=overlap, dtype="float32", always_2d=True):
+        yield start / rate, resample(to_mono_float32(block), rate)
+        start += window - overlap
+
+
+def frame_energy_db(samples, frame_ms=VAD_FRAME_MS):
+    """Mean power of each whole `frame_ms` frame, in dB relative to full scale."""
+    frame = SAMPLE_RATE * frame_ms // 1000
+    n = len(samples) // frame
+    frames = np.asarray(samples[:n * frame], dtype=np.float32).reshape(n, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    return 10 * np.log10(power + 1e-12)
+
+
+def speech_frames(samples, frame_ms=VAD_FRAME_MS):
+    """Boolean mask of the frames that hold speech.
+
+    The threshold adapts to the recording, so it does not depend on microphone
+    gain: a margin above its quietest frames (the noise floor), but never above
+    a margin below its loudest, so a clip that is speech throughout is still
+    detected, and never more than VAD_RANGE_DB below its loudest.
+    A clip whose loudest frame is not a margin above its noise floor is steady
+    noise (hum, hiss, a quiet room) and holds no speech at any level.
+    """
+    energy = frame_energy_db(samples, frame_ms)
+    if not len(energy):
+        return np.zeros(0, dtype=bool)
+    noise, peak = np.percentile(energy, 10), energy.max()
+    if peak - noise < VAD_MARGIN_DB:
+        return np.zeros(len(energy), dtype=bool)
+    # Never at or below the noise floor itself, however little contrast there is
+    threshold = max(VAD_FLOOR_DB, peak - VAD_RANGE_DB, noise + VAD_MARGIN_DB / 4,
+                    min(noise + VAD_MARGIN_DB, peak - 2 * VAD_MARGIN_DB))
+    return energy > threshold
+
+
+def trim_silence(samples, frame_ms=VAD_FRAME_MS):
+    """(samples without leading/trailing silence, speech ratio).
+
+    The trimmed buffer is a view and keeps VAD_PAD_MS of context on each side;
+    it is empty when less than VAD_MIN_SPEECH_MS of speech was found. The
+    speech ratio is the fraction of frames that hold speech.
+    """
+    mask = speech_frames(samples, frame_ms)
+    if not len(mask):
+        return samples[:0], 0.0
+    ratio = round(float(mask.mean()), 3)
+    if mask.sum() * frame_ms < VAD_MIN_SPEECH_MS:
+        return samples[:0], ratio
+    frame = SAMPLE_RATE * frame_ms // 1000
+    pad = VAD_PAD_MS // frame_ms
+    speech = np.flatnonzero(mask)
+    start = max(0, (speech[0] - pad) * frame)
+    end = min(len(samples), (speech[-1] + 1 + pad) * frame)
+    return samples[start:end], ratio
+
+
+def write_wav(samples, filename, sample_rate=SAMPLE_RATE):
+    """Write a float32 or int16 buffer as a 16-bit mono WAV file."""
+    samples = np.asarray(samples).reshape(-1)
+    if samples.dtype != np.int16:
+        samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.tobytes())
+    return filename
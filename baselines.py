@@ -0,0 +1,270 @@
+# baselines.py
+"""Per-worker readiness baselines, kept as running statistics.
+
+Every answer's positive and negative score (speech.answer_scores) is folded
+into a running count, mean and sum of squared deviations per worker, one
+SQLite row each. Folding a session in is O(1) however long the history is, so
+readiness can be normalised against a worker's own past answers without
+rereading old reports or sessions.
+
+    python baselines.py rebuild                  # recompute every row from the session store
+    python baselines.py show User001
+"""
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+BASELINE_DB = os.environ.get("BASELINE_DB", "worker_baselines.db")  # empty: session-local z-scores only
+# Answers a worker needs on record before their own baseline replaces the in-session one
+MIN_HISTORY = int(os.environ.get("BASELINE_MIN_ANSWERS", "10"))
+
+
+class RunningStats:
+    """Count, mean and sum of squared deviations, updated one value or one batch at a time."""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n, self.mean, self.m2 = n, mean, m2
+
+    @classmethod
+    def of(cls, values):
+        stats = cls()
+        for x in values:
+            stats.push(x)
+        return stats
+
+    def push(self, x):
+        # Welford's update
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        # Chan et al.'s pairwise combination, so a whole session folds in at once
+        if not other.n:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def __repr__(self):
+        return f"RunningStats(n={self.n}, mean={self.mean:.3f}, std={self.std:.3f})"
+
+
+Baseline = namedtuple("Baseline", ["pos", "neg"])
+
+
+def usable(baseline):
+    """True when `baseline` has enough history to normalise against."""
+    return baseline is not None and baseline.pos.n >= MIN_HISTORY
+
+
+class BaselineStore:
+    """One row of running statistics per worker in a SQLite file, safe to share between processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # Connections must not cross a fork, so every process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS baselines (worker TEXT PRIMARY KEY, n INTEGER NOT NULL, "
+                "pos_mean REAL NOT NULL, pos_m2 REAL NOT NULL, neg_mean REAL NOT NULL, neg_m2 REAL NOT NULL, "
+                "updated REAL NOT NULL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _from_row(row):
+        n, pos_mean, pos_m2, neg_mean, neg_m2 = row
+        return Baseline(RunningStats(n, pos_mean, pos_m2), RunningStats(n, neg_mean, neg_m2))
+
+    def get(self, worker):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT n, pos_mean, pos_m2, neg_mean, neg_m2 FROM baselines WHERE worker = ?", (worker,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_many(self, workers, chunk=500):
+        """{worker: Baseline} for those of `workers` that have a row."""
+        workers = list(dict.fromkeys(workers))
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for i in range(0, len(workers), chunk):
+                part = workers[i:i + chunk]
+                rows = conn.execute(
+                    "SELECT worker, n, pos_mean, pos_m2, neg_mean, neg_m2 FROM baselines "
+                    f"WHERE worker IN ({','.join('?' * len(part))})", part
+                )
+                found.update((row[0], self._from_row(row[1:])) for row in rows)
+        return found
+
+    def update(self, worker, pos_values, neg_values):
+        """Fold one session's answer scores into `worker`'s baseline and return the new baseline."""
+        session = Baseline(RunningStats.of(pos_values), RunningStats.of(neg_values))
+        with self._lock:
+            conn = self._connection()
+            # Read-modify-write under a write lock, so concurrent sessions never lose an update
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT n, pos_mean, pos_m2, neg_mean, neg_m2 FROM baselines WHERE worker = ?", (worker,)
+                ).fetchone()
+                baseline = self._from_row(row) if row else Baseline(RunningStats(), RunningStats())
+                baseline.pos.merge(session.pos)
+                baseline.neg.merge(session.neg)
+                self._write(conn, [(worker, baseline)])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return baseline
+
+    def replace_all(self, baselines):
+        """Replace every row with `baselines` ({worker: Baseline}) in one transaction."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM baselines")
+                self._write(conn, baselines.items())
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _write(conn, items):
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO baselines (worker, n, pos_mean, pos_m2, neg_mean, neg_m2, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(w, b.pos.n, b.pos.mean, b.pos.m2, b.neg.mean, b.neg.m2, now) for w, b in items],
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM baselines").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """The process-wide baseline store, or None when BASELINE_DB is empty."""
+    global _store
+    if not BASELINE_DB:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = BaselineStore(BASELINE_DB)
+        return _store
+
+
+def reference_arrays(workers, baselines):
+    """Per-session (pos_mean, pos_std, neg_mean, neg_std) arrays for analytics.readiness.
+
+    Sessions whose worker has no usable baseline get NaN and fall back to
+    in-session z-scores.
+    """
+    import numpy as np
+
+    refs = np.full((4, len(workers)), np.nan)
+    for i, worker in enumerate(workers):
+        b = baselines.get(worker)
+        if usable(b):
+            refs[:, i] = b.pos.mean, b.pos.std, b.neg.mean, b.neg.std
+    return tuple(refs)
+
+
+def rebuild(paths, path=None):
+    """Recompute every worker's baseline from stored sessions; returns the number of workers."""
+    import numpy as np
+    from analytics import load_matrix, top3_scores
+
+    m = load_matrix(paths)
+    pos, neg = top3_scores(m.sentiment)
+    workers, inverse = np.unique(m.worker.astype(str), return_inverse=True)
+    mask = m.answered
+
+    # Per-worker count, mean and squared deviations in a few array passes
+    n = np.bincount(inverse, weights=mask.sum(1), minlength=len(workers))
+    stats = []
+    for values in (pos, neg):
+        sums = np.bincount(inverse, weights=(values * mask).sum(1), minlength=len(workers))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.nan_to_num(sums / n)
+        m2 = np.bincount(inverse, weights=(((values - means[inverse][:, None]) * mask) ** 2).sum(1),
+                         minlength=len(workers))
+        stats.append((means, m2))
+
+    (pos_mean, pos_m2), (neg_mean, neg_m2) = stats
+    baselines = {
+        str(w): Baseline(RunningStats(int(n[i]), float(pos_mean[i]), float(pos_m2[i])),
+                         RunningStats(int(n[i]), float(neg_mean[i]), float(neg_m2[i])))
+        for i, w in enumerate(workers) if n[i]
+    }
+    (BaselineStore(path) if path else store()).replace_all(baselines)
+    return len(baselines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-worker readiness baselines.")
+    parser.add_argument("--db", default=BASELINE_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = commands.add_parser("rebuild", help="recompute all baselines from stored sessions")
+    rebuild_cmd.add_argument("paths", nargs="*", help="session store directory or JSONL files (default: STORE_DIR)")
+    show_cmd = commands.add_parser("show", help="print workers' baselines")
+    show_cmd.add_argument("workers", nargs="+")
+    args = parser.parse_args()
+
+    if not args.db:
+        parser.error("no baseline database (set BASELINE_DB or pass --db)")
+
+    if args.command == "rebuild":
+        count = rebuild(args.paths, args.db)
+        print(f"✅ Baselines rebuilt for {count} workers in {args.db}")
+        return 0
+
+    found = BaselineStore(args.db).get_many(args.workers)
+    for worker in args.workers:
+        b = found.get(worker)
+        if b is None:
+            print(f"❔ {worker}: no history")
+            continue
+        mark = "✅" if usable(b) else "⏳"
+        print(f"{mark} {worker}: {b.pos.n} answers  positive {b.pos.mean:.2f} ± {b.pos.std:.2f}  "
+              f"negative {b.neg.mean:.2f} ± {b.neg.std:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# batch_analyze.py
+"""Offline analysis of recorded answers, one JSON line per audio file.
+
+    python batch_analyze.py recordings/ --workers 4 -o results.jsonl
+    python batch_analyze.py manifest.txt --stages asr,sentiment,moderation
+
+The input is a directory (searched recursively for --pattern) or a manifest:
+a text file with one path per line, or JSON lines with a "path" field. Every
+worker process loads each model once and reuses it for all of its files.
+"""
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+STAGES = ["asr", "emotion", "sentiment", "moderation", "audio_emotion"]
+
+# Registry models each stage needs, for warming a worker up before its first file
+STAGE_MODELS = {
+    "asr": ["whisper"],
+    "emotion": ["emotion"],
+    "sentiment": ["go_emotion"],
+    "moderation": ["toxic"],
+    "audio_emotion": ["audio_emotion"],
+}
+
+_stages = STAGES
+
+
+def find_audio_files(source, pattern="*.wav"):
+    """Paths listed by a manifest file, or every file under a directory matching `pattern`."""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if fnmatch.fnmatch(name.lower(), pattern.lower()):
+                    yield os.path.join(root, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def _init_worker(stages, threads):
+    global _stages
+    _stages = stages
+
+    # Split the cores between workers instead of letting every process grab them all
+    import torch
+    torch.set_num_threads(threads)
+
+    from models import get_pipeline
+    for stage in stages:
+        for name in STAGE_MODELS[stage]:
+            get_pipeline(name)
+
+
+def _cache_lookups():
+    """(hits, misses) over this process's result caches so far."""
+    from cache import cache_stats
+
+    stats = cache_stats().values()
+    return sum(s["hits"] + s["backing_hits"] for s in stats), sum(s["misses"] for s in stats)
+
+
+def analyze_file(path, stages=None):
+    """Run the selected stages on one audio file and return its JSON-ready record."""
+    from audio import duration, load_audio
+
+    stages = stages or _stages
+    record = {"file": path}
+    start = time.perf_counter()
+    hits_before, misses_before = _cache_lookups()
+    try:
+        seconds = duration(path)
+        record["duration_s"] = round(seconds, 2)
+        long_recording = False
+        if "audio_emotion" in stages:
+            from Risk_score import AUDIO_STREAMING_MIN_S
+            long_recording = seconds > AUDIO_STREAMING_MIN_S
+
+        # Long recordings are only decoded whole when ASR needs them; audio
+        # emotion reads them from the file one window at a time
+        samples = load_audio(path) if "asr" in stages or not long_recording else None
+
+        text = None
+        if "asr" in stages:
+            from voice import transcribe_many, trim_answer
+            speech, record["speech_ratio"] = trim_answer(samples)
+            text = transcribe_many([speech], vad=False)[0]
+            record["answer"] = text
+            if long_recording:
+                speech = samples = None  # free the decoded file before windowing it
+
+        if text and "emotion" in stages:
+            from voice import classify_emotions
+            record["emotion"] = classify_emotions([text])[0]
+
+        if text and "sentiment" in stages:
+            import sentiment
+            record["sentiment"] = sentiment.analyze_many([text])[0]
+
+        if text and "moderation" in stages:
+            import moderation
+            (record["moderation"],), (record["moderation_status"],) = moderation.analyze_many(
+                [text], with_status=True)
+
+        if "audio_emotion" in stages:
+            from Risk_score import classify_audio_emotion, classify_audio_emotion_windows, score_audio_emotion
+            if long_recording:
+                results = classify_audio_emotion_windows(path)
+            else:
+                results = classify_audio_emotion(samples)
+            record["audio_emotion"] = {r["label"]: round(r["score"], 4) for r in results}
+            record["mental_score"] = round(score_audio_emotion(results), 2)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    hits, misses = _cache_lookups()
+    if hits + misses > hits_before + misses_before:
+        record["cache"] = {"hits": hits - hits_before, "misses": misses - misses_before}
+    record["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse recorded answers without a microphone.")
+    parser.add_argument("source", help="directory of recordings or manifest file")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="torch threads per worker (default: cores / workers)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--pattern", default="*.wav", help="file pattern when SOURCE is a directory")
+    parser.add_argument("--ordered", action="store_true",
+                        help="write records in input order instead of as they finish")
+    parser.add_argument("--audio-cache", help="SQLite file caching ASR and audio emotion results by audio fingerprint")
+    parser.add_argument("--text-cache", help="SQLite file caching text classifier results")
+    args = parser.parse_args()
+
+    # Workers read these when they first import cache.py
+    if args.audio_cache:
+        os.environ["AUDIO_CACHE_DB"] = args.audio_cache
+    if args.text_cache:
+        os.environ["TEXT_CACHE_DB"] = args.text_cache
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    if any(s in stages for s in ("emotion", "sentiment", "moderation")) and "asr" not in stages:
+        parser.error("text stages need the asr stage")
+
+    paths = list(find_audio_files(args.source, args.pattern))
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    done = failed = cache_hits = cache_misses = 0
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(stages, threads)) as pool:
+            mapper = pool.imap if args.ordered else pool.imap_unordered
+            for record in mapper(analyze_file, paths, chunksize=1):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                done += 1
+                failed += "error" in record
+                cache_hits += record.get("cache", {}).get("hits", 0)
+                cache_misses += record.get("cache", {}).get("misses", 0)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {done} files analysed ({failed} failed) in {elapsed:.1f}s with {args.workers} workers",
+          file=sys.stderr)
+    if cache_hits + cache_misses:
+        print(f"🗃️ Result cache: {cache_hits} hits, {cache_misses} misses "
+              f"({cache_hits / (cache_hits + cache_misses):.0%} hit rate)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# benchmark.py
+"""Latency, throughput and memory benchmark for the analysis pipeline.
+
+    python benchmark.py                      # stub models, runs in seconds
+    python benchmark.py --mode real          # real models on CPU with speech.wav
+    python benchmark.py --update-baseline    # store this run as the baseline
+    python benchmark.py --json results.json  # also write the raw numbers
+
+Stub mode swaps every registry model for a deterministic stand-in, so it times
+the repo's own code (pre/post-processing, caching, report building). Real mode
+times the full models. Each run is compared against benchmark_baseline.json:
+a stage whose median latency grows by more than --tolerance, or any change in
+the analysis outputs, is reported as a regression and the exit status is 1.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SPEECH_WAV = os.path.join(HERE, "speech.wav")
+BASELINE_FILE = os.path.join(HERE, "benchmark_baseline.json")
+
+STUB_ANSWERS = ["I am feeling good.", "Yes.", "See you tomorrow.", "Oh, no.", "Thank you."]
+HUBERT_LABELS = ["neu", "hap", "ang", "sad"]
+
+QUESTIONS_PER_SESSION = 5
+
+
+class StubPipeline:
+    """Deterministic stand-in for a transformers pipeline.
+
+    Scores are derived from a hash of the input, so identical inputs always
+    give identical outputs; output shapes follow the real pipeline's.
+    """
+
+    tokenizer = None
+    model = None
+
+    def __init__(self, kind, labels=None, top_k=None):
+        self.kind = kind        # "asr", "text" or "audio"
+        self.labels = labels or []
+        self.top_k = top_k
+
+    def _seed(self, item):
+        if isinstance(item, dict):
+            item = item["raw"]
+        data = item.encode("utf-8") if isinstance(item, str) else item.tobytes()
+        return int.from_bytes(hashlib.sha1(data).digest()[:8], "little")
+
+    def _scores(self, item):
+        rng = random.Random(self._seed(item))
+        weights = [rng.random() ** 4 for _ in self.labels]
+        total = sum(weights)
+        return sorted(({"label": l, "score": w / total} for l, w in zip(self.labels, weights)),
+                      key=lambda r: r["score"], reverse=True)
+
+    def _one(self, item):
+        if self.kind == "asr":
+            return {"text": " " + STUB_ANSWERS[self._seed(item) % len(STUB_ANSWERS)]}
+        scores = self._scores(item)
+        return scores[:self.top_k] if self.top_k else scores
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        if isinstance(inputs, list):
+            return [self._one(x) for x in inputs]
+        out = self._one(inputs)
+        # return_all_scores text pipelines wrap a single input's scores in a list
+        return [out] if self.kind == "text" and not self.top_k else out
+
+
+def install_stubs():
+    import models
+    from moderation import TOXIC_LABELS
+    from sentiment import GO_EMOTION_LABELS, GO_EMOTION_TO_EMOTION
+
+    stubs = {
+        "whisper": lambda: StubPipeline("asr"),
+        "whisper_tiny": lambda: StubPipeline("asr"),
+        "emotion": lambda: StubPipeline("text", list(GO_EMOTION_TO_EMOTION), top_k=1),
+        "go_emotion": lambda: StubPipeline("text", GO_EMOTION_LABELS),
+        "toxic": lambda: StubPipeline("text", TOXIC_LABELS),
+        "audio_emotion": lambda: StubPipeline("audio", HUBERT_LABELS),
+    }
+    for name, factory in stubs.items():
+        models.set_factory(name, factory)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def time_stage(fn, iterations):
+    """Run fn once to warm up, then `iterations` times; returns (latency stats, last output)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = fn()
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            output = fn()
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    mean = statistics.mean(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "mean_ms": round(mean, 3),
+        "throughput_per_s": round(1000 / mean, 2) if mean else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }, output
+
+
+def run_benchmark(mode, iterations):
+    import cache
+    import models
+    from audio import load_audio
+
+    random.seed(0)
+    # Measure the models, not the result caches
+    cache.TEXT_CACHE_SIZE = 0
+    cache.AUDIO_CACHE_DB = None
+    if mode == "stub":
+        install_stubs()
+    else:
+        import torch
+        torch.manual_seed(0)
+
+    import moderation
+    import sentiment
+    import speech
+    from Risk_score import analyze_audio_sentiment
+    from voice import analyze_emotion_from_audio
+
+    samples = load_audio(SPEECH_WAV)
+    stages = {}
+
+    for name in models.MODEL_SPECS:
+        start = time.perf_counter()
+        models.get_pipeline(name)
+        stages[f"model_load.{name}"] = {"p50_ms": round((time.perf_counter() - start) * 1000, 3),
+                                        "peak_rss_mb": peak_rss_mb()}
+
+    stages["voice.analyze_emotion_from_audio"], (text, emotion) = time_stage(
+        lambda: analyze_emotion_from_audio(samples), iterations)
+    text = text or STUB_ANSWERS[0]
+    stages["sentiment.analyze_sentiment"], sentiment_result = time_stage(
+        lambda: sentiment.analyze_sentiment(text), iterations)
+    stages["moderation.analyze_moderation"], moderation_result = time_stage(
+        lambda: moderation.analyze_moderation(text), iterations)
+    stages["Risk_score.analyze_audio_sentiment"], mental_score = time_stage(
+        lambda: analyze_audio_sentiment(samples), iterations)
+
+    # A five-answer session like the saved reports, with the benchmarked answer first
+    answers = [text] + STUB_ANSWERS[1:QUESTIONS_PER_SESSION]
+    with contextlib.redirect_stdout(io.StringIO()):
+        session_sentiments = sentiment.analyze_many(answers)
+        session_moderations = moderation.analyze_many(answers)
+    responses = [{
+        "question": question,
+        "answer": answer,
+        "emotion": emotion,
+        "sentiment": sentiment_scores,
+        "moderation": moderation_scores,
+    } for question, answer, sentiment_scores, moderation_scores
+        in zip(speech.questions, answers, session_sentiments, session_moderations)]
+
+    # Reports are written to the working directory; keep them out of the repo
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as report_dir:
+        os.chdir(report_dir)
+        try:
+            stages["generate_sentiment_report"], _ = time_stage(
+                lambda: speech.generate_sentiment_report(responses), iterations)
+            stages["generate_readiness_score_report"], readiness_file = time_stage(
+                lambda: speech.generate_readiness_score_report(responses), iterations)
+            with open(readiness_file, encoding="utf-8") as f:
+                readiness_line = next((l for l in f if "Final Readiness Score" in l), "").strip()
+        finally:
+            os.chdir(previous_dir)
+
+    top_sentiments = sorted(sentiment_result.items(), key=lambda x: x[1], reverse=True)[:3]
+    outputs = {
+        "transcript": text,
+        "emotion": emotion,
+        "top_sentiments": [[label, round(score, 1)] for label, score in top_sentiments],
+        "max_moderation": round(max(moderation_result.values()), 3) if moderation_result else None,
+        "audio_mental_score": round(mental_score, 2),
+        "readiness": readiness_line,
+    }
+    return {
+        "mode": mode,
+        "iterations": iterations,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stages": stages,
+        "outputs": outputs,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Regression messages for `result` against a baseline run of the same mode."""
+    problems = []
+    for stage, stats in result["stages"].items():
+        base = baseline["stages"].get(stage)
+        if not base or stage.startswith("model_load."):
+            continue
+        # Sub-millisecond stages are noise-dominated; allow an absolute slack too
+        if stats["p50_ms"] > base["p50_ms"] * (1 + tolerance) + 0.05:
+            problems.append(f"{stage}: p50 {stats['p50_ms']:.2f} ms vs baseline {base['p50_ms']:.2f} ms")
+    for key, value in result["outputs"].items():
+        if baseline["outputs"].get(key) != value:
+            problems.append(f"output {key}: {value!r} vs baseline {baseline['outputs'].get(key)!r}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline.")
+    parser.add_argument("--mode", choices=["stub", "real"], default="stub")
+    parser.add_argument("--iterations", type=int, help="timed runs per stage (default: 50 stub, 5 real)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p50 slowdown")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="write the full result to this file")
+    args = parser.parse_args()
+
+    iterations = args.iterations or (50 if args.mode == "stub" else 5)
+    result = run_benchmark(args.mode, iterations)
+
+    print(f"📈 Benchmark ({args.mode} models, {iterations} iterations)")
+    for stage, stats in result["stages"].items():
+        extra = f"  p95 {stats['p95_ms']:9.2f} ms  {stats['throughput_per_s']:8.1f}/s" if "p95_ms" in stats else ""
+        print(f"   {stage:<38} p50 {stats['p50_ms']:9.2f} ms{extra}")
+    if result["peak_rss_mb"] is not None:
+        print(f"🧠 Peak RSS: {result['peak_rss_mb']:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.update_baseline:
+        baselines[args.mode] = result
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"📁 Baseline for {args.mode} mode saved to {args.baseline}")
+        return 0
+
+    if args.mode not in baselines:
+        print("ℹ️ No baseline for this mode yet; run with --update-baseline to create one.")
+        return 0
+
+    problems = compare(result, baselines[args.mode], args.tolerance)
+    if problems:
+        print("⚠️ Regressions against baseline:")
+        for problem in problems:
+            print(f"   - {problem}")
+        return 1
+    print("✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+# cache.py
+"""Result caches: a bounded in-process LRU, optionally backed by SQLite on disk.
+
+Text classifier results are memoised by model identity plus normalised
+transcript (see memoize_texts); set TEXT_CACHE_DB to a file path to keep them
+across runs and share them between processes.
+
+ASR transcripts and audio emotion scores are memoised by a fingerprint of the
+decoded 16 kHz PCM plus model identity and generation settings (see
+memoize_audio) once AUDIO_CACHE_DB points at a file, so re-running archived
+recordings only recomputes stages whose model or settings changed.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = int(os.environ.get("TEXT_CACHE_SIZE", "10000"))
+TEXT_CACHE_DB = os.environ.get("TEXT_CACHE_DB")  # unset: memory only
+TEXT_CACHE_DB_MAX = int(os.environ.get("TEXT_CACHE_DB_MAX", "1000000"))
+
+AUDIO_CACHE_DB = os.environ.get("AUDIO_CACHE_DB")  # unset: audio results are not cached
+AUDIO_CACHE_MAX_MB = float(os.environ.get("AUDIO_CACHE_MAX_MB", "512"))
+AUDIO_CACHE_SIZE = 256  # in-memory entries in front of the SQLite file
+
+# Size limits are enforced every this many writes; a full scan per write would dominate
+EVICT_EVERY = 100
+
+
+class SqliteCache:
+    """JSON values in one SQLite table, evicting least recently used rows.
+
+    Rows past `max_entries`, or beyond `max_bytes` of stored JSON, are dropped
+    oldest-use first. WAL mode and a busy timeout let several worker processes
+    share one file.
+    """
+
+    def __init__(self, path, table="cache", max_entries=None, max_bytes=None):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+
+    def _connection(self):
+        # Connections must not cross a fork, so every process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table}(last_used)")
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        if self.max_entries:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            # Keep the most recently used rows whose running size fits the budget
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM ("
+                f"SELECT key, SUM(length(value)) OVER (ORDER BY last_used DESC) AS running "
+                f"FROM {self.table}) WHERE running > ?)",
+                (self.max_bytes,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with hit/miss counters and an optional slower `backing` tier."""
+
+    def __init__(self, maxsize=1024, backing=None):
+        self.maxsize = maxsize
+        self.backing = backing
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.backing_hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+        value = self.backing.get(key) if self.backing is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.backing_hits += 1
+            self._store(key, value)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        if self.backing is not None:
+            self.backing.put(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.backing_hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "backing_hits": self.backing_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.backing_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.backing_hits = self.misses = 0
+        if self.backing is not None:
+            self.backing.clear()
+
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def text_cache():
+    """The process-wide text result cache, created on first use from the TEXT_CACHE_* settings."""
+    global _text_cache
+    with _text_cache_lock:
+        if _text_cache is None:
+            backing = SqliteCache(TEXT_CACHE_DB, "text_results", TEXT_CACHE_DB_MAX) if TEXT_CACHE_DB else None
+            _text_cache = LRUCache(TEXT_CACHE_SIZE, backing)
+        return _text_cache
+
+
+def normalize_text(text):
+    # All text classifiers here are uncased BERT variants, so case and
+    # whitespace do not change their output.
+    return " ".join(text.split()).lower()
+
+
+def memoize_texts(model_name, texts, compute):
+    """Per-text results of `compute(texts)`, running it only on texts not already cached.
+
+    Results are keyed by the registry model identity and the normalised text,
+    so duplicates within `texts` are computed once as well.
+    """
+    from models import model_id
+
+    if TEXT_CACHE_SIZE <= 0:
+        return compute(list(texts))
+
+    cache = text_cache()
+    prefix = model_id(model_name) + "\0"
+    return _memoize(cache, [prefix + normalize_text(t) for t in texts], texts, compute)
+
+
+def _memoize(cache, keys, items, compute):
+    results = [cache.get(k) for k in keys]
+
+    missing = OrderedDict()  # key -> item, first occurrence of each uncached key
+    for key, item, result in zip(keys, items, results):
+        if result is None and key not in missing:
+            missing[key] = item
+    if missing:
+        for key, value in zip(missing, compute(list(missing.values()))):
+            cache.put(key, value)
+            missing[key] = value
+        results = [missing[k] if r is None else r for k, r in zip(keys, results)]
+    return results
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def audio_cache():
+    """The process-wide audio result cache, or None when AUDIO_CACHE_DB is unset."""
+    global _audio_cache
+    if not AUDIO_CACHE_DB:
+        return None
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            backing = SqliteCache(AUDIO_CACHE_DB, "audio_results", max_bytes=int(AUDIO_CACHE_MAX_MB * 1024 * 1024))
+            _audio_cache = LRUCache(AUDIO_CACHE_SIZE, backing)
+        return _audio_cache
+
+
+def cache_stats():
+    """LRUCache.stats() of each cache this process has created, by name ("text", "audio")."""
+    caches = {"text": _text_cache, "audio": _audio_cache}
+    return {name: c.stats() for name, c in caches.items() if c is not None}
+
+
+def audio_fingerprint(samples):
+    """Content hash of a decoded 16 kHz float32 buffer, independent of the file it came from."""
+    import numpy as np
+
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    return hashlib.blake2b(memoryview(samples).cast("B"), digest_size=16).hexdigest()
+
+
+def memoize_audio(model_name, buffers, compute):
+    """Per-buffer results of `compute(buffers)`, running it only on audio not already cached.
+
+    Keys combine the PCM fingerprint with the registry model identity and its
+    generation settings. Without AUDIO_CACHE_DB this is just compute(buffers).
+    """
+    from models import model_id, model_settings
+
+    cache = audio_cache()
+    if cache is None:
+        return compute(list(buffers))
+
+    prefix = f"{model_id(model_name)}\0{model_settings(model_name)}\0"
+    return _memoize(cache, [prefix + audio_fingerprint(b) for b in buffers], buffers, compute)
@@ -0,0 +1,309 @@
+# capture.py
+"""Streaming microphone capture that stops at the end of the answer.
+
+A sounddevice InputStream callback writes 16 kHz mono float32 blocks into a
+preallocated ring buffer while a frame-energy endpointer (the same thresholds
+as audio.trim_silence) watches for the answer to start and then for a stretch
+of trailing silence. A "yes" therefore returns about a second after it is
+said instead of after the full recording window, and chunks() hands out audio
+while it is still being recorded, so ASR can start early (voice.transcribe_live).
+
+Set CAPTURE_WAV to a WAV file to capture from it instead of the microphone: a
+stand-in stream replays it in real time (then silence) through the same
+callback, which is how this runs on a headless box.
+
+    python capture.py                # record one answer from the microphone
+    python capture.py answer.wav     # replay a file through the stand-in stream
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from audio import SAMPLE_RATE, VAD_FLOOR_DB, VAD_MARGIN_DB, load_audio
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MODE = os.environ.get("CAPTURE_MODE", "streaming")  # or "fixed": always record the whole window with sd.rec
+CAPTURE_WAV = os.environ.get("CAPTURE_WAV")  # replay this file instead of opening the microphone
+END_SILENCE_MS = int(os.environ.get("CAPTURE_END_SILENCE_MS", "700"))  # silence that ends an answer
+NO_SPEECH_S = float(os.environ.get("CAPTURE_NO_SPEECH_S", "5"))        # give up if nothing is said
+BLOCK_MS = 30  # callback block and endpointer frame size
+STALL_MARGIN_S = 2.0  # how long past max_s to wait for a stream that stopped delivering audio
+
+
+class RingBuffer:
+    """Fixed-capacity float32 ring addressed by absolute sample position; one writer, many readers."""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.written = 0  # samples written since creation
+        self._lock = threading.Lock()
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        with self._lock:
+            start = self.written % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.written += len(samples)
+
+    def read(self, start, end=None):
+        """Copy of samples [start, end) by absolute position; positions already overwritten are dropped."""
+        with self._lock:
+            end = self.written if end is None else min(end, self.written)
+            start = max(start, end - self.capacity, 0)
+            if end <= start:
+                return np.zeros(0, dtype=np.float32)
+            a, b = start % self.capacity, end % self.capacity
+            if a < b or b == 0 and a > 0:
+                return self._data[a:b or self.capacity].copy()
+            return np.concatenate([self._data[a:], self._data[:b]])
+
+
+class Endpointer:
+    """Decides, frame by frame, when an answer has started and when it has ended."""
+
+    def __init__(self, end_silence_ms=END_SILENCE_MS, no_speech_s=NO_SPEECH_S, frame_ms=BLOCK_MS):
+        self.frame = SAMPLE_RATE * frame_ms // 1000
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.no_speech_frames = int(no_speech_s * 1000 / frame_ms)
+        self.noise_db = None
+        self.frames = self.speech_frames = self.silent_run = 0
+        self.started = self.ended = False
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def push(self, samples):
+        """Feed new audio; returns True once the answer is over (or never started)."""
+        samples = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        n = len(samples) // self.frame
+        self._pending = samples[n * self.frame:].copy()
+        if not n or self.ended:
+            return self.ended
+        frames = samples[:n * self.frame].reshape(n, self.frame)
+        energy = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / self.frame + 1e-12)
+        for db in energy:
+            self._step(db)
+            if self.ended:
+                break
+        return self.ended
+
+    def _step(self, db):
+        self.frames += 1
+        # The noise floor follows quiet frames quickly and loud ones slowly
+        if self.noise_db is None:
+            self.noise_db = db
+        else:
+            self.noise_db += (0.3 if db < self.noise_db else 0.01) * (db - self.noise_db)
+        speech = db > max(VAD_FLOOR_DB, self.noise_db + VAD_MARGIN_DB)
+
+        if speech:
+            self.speech_frames += 1
+            self.silent_run = 0
+            self.started = self.started or self.speech_frames >= 3
+        else:
+            self.silent_run += 1
+        if self.started and self.silent_run >= self.end_frames:
+            self.ended = True
+        elif not self.started and self.frames >= self.no_speech_frames:
+            self.ended = True
+
+
+class WavInputStream:
+    """Stand-in for sounddevice.InputStream that replays a file, then silence, through `callback`.
+
+    `speed` > 1 replays faster than real time (tests); the callback gets
+    (indata, frames, time, status) with indata shaped (frames, 1) as sounddevice does.
+    """
+
+    def __init__(self, path, callback, blocksize, samplerate=SAMPLE_RATE, speed=1.0, **_):
+        if samplerate != SAMPLE_RATE:
+            raise ValueError("the stand-in stream only produces 16 kHz audio")
+        self.samples = load_audio(path)
+        self.callback = callback
+        self.blocksize = blocksize
+        self.speed = speed
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        block_s = self.blocksize / SAMPLE_RATE
+        position = 0
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            block = self.samples[position:position + self.blocksize]
+            if len(block) < self.blocksize:
+                block = np.concatenate([block, np.zeros(self.blocksize - len(block), dtype=np.float32)])
+            position += self.blocksize
+            self.callback(block.reshape(-1, 1), self.blocksize, None, None)
+            next_time += block_s / self.speed
+            self._stop.wait(max(0.0, next_time - time.monotonic()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="wav-input", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _open_stream(callback, blocksize, wav=None):
+    wav = wav or CAPTURE_WAV
+    if wav:
+        return WavInputStream(wav, callback, blocksize)
+    try:
+        import sounddevice as sd
+    except ImportError as e:
+        raise ImportError("Microphone capture needs the sounddevice package: pip install sounddevice "
+                          "(or set CAPTURE_WAV to replay a file)") from e
+
+    return sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype="float32",
+                          blocksize=blocksize, callback=callback)
+
+
+class StreamingRecorder:
+    """One answer's capture: ring buffer, endpointer and input stream.
+
+        with StreamingRecorder(max_s=10) as rec:
+            for chunk in rec.chunks(1.0):   # optional: new audio, while recording
+                ...
+        samples = rec.samples()
+    """
+
+    def __init__(self, max_s=10.0, end_silence_ms=END_SILENCE_MS, no_speech_s=NO_SPEECH_S,
+                 wav=None, stream_factory=None):
+        self.max_s = max_s
+        self.max_samples = int(max_s * SAMPLE_RATE)
+        self.timed_out = False
+        self.ring = RingBuffer(self.max_samples)
+        self.endpointer = Endpointer(end_silence_ms, no_speech_s)
+        self.done = threading.Event()
+        self._new_audio = threading.Condition()
+        self._closed = False
+        blocksize = SAMPLE_RATE * BLOCK_MS // 1000
+        if stream_factory is None:
+            self._stream = _open_stream(self._callback, blocksize, wav)
+        else:
+            self._stream = stream_factory(self._callback, blocksize)
+
+    def _callback(self, indata, frames, time_info, status):
+        if self.done.is_set():
+            return
+        block = indata[:, 0] if indata.ndim == 2 else indata
+        room = self.max_samples - self.ring.written
+        block = block[:room]
+        self.ring.write(block)
+        ended = self.endpointer.push(block)
+        if ended or self.ring.written >= self.max_samples:
+            self.done.set()
+        with self._new_audio:
+            self._new_audio.notify_all()
+
+    def start(self):
+        self._stream.start()
+        return self
+
+    def _stalled(self):
+        self.timed_out = True
+        logger.warning("Audio input stalled after %.2fs of audio; giving up on this answer",
+                       self.ring.written / SAMPLE_RATE)
+
+    def wait(self, timeout=None):
+        """Block until the answer ends (or max_s is reached); returns the captured samples.
+
+        A stream that stops delivering audio (device unplugged, stream error)
+        is given up on after `timeout`, by default max_s + STALL_MARGIN_S.
+        """
+        if not self.done.wait(self.max_s + STALL_MARGIN_S if timeout is None else timeout):
+            self._stalled()
+        self.stop()
+        return self.samples()
+
+    def chunks(self, every_s=1.0):
+        """Yield the audio that arrived since the previous chunk, every `every_s` seconds, until the answer ends.
+
+        Chunks are consecutive and together make up the whole recording, so a
+        consumer (voice.transcribe_stream) can start on the answer while it is
+        still being given.
+        """
+        step = int(every_s * SAMPLE_RATE)
+        yielded = 0
+        deadline = time.monotonic() + self.max_s + STALL_MARGIN_S
+        while True:
+            with self._new_audio:
+                self._new_audio.wait_for(lambda: self.done.is_set() or self.ring.written - yielded >= step,
+                                         timeout=1.0)
+            if self.done.is_set():
+                break
+            if time.monotonic() > deadline:
+                self._stalled()
+                break
+            if self.ring.written - yielded >= step:
+                end = self.ring.written
+                yield self.ring.read(yielded, end)
+                yielded = end
+        self.stop()
+        if self.ring.written > yielded:
+            yield self.ring.read(yielded)
+
+    def samples(self):
+        return self.ring.read(0)
+
+    @property
+    def speech_detected(self):
+        return self.endpointer.started
+
+    def stop(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stream.stop()
+        self._stream.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def record_answer(max_s=10.0, wav=None):
+    """Record one answer from the microphone (or CAPTURE_WAV), stopping at end of speech; 16 kHz float32.
+
+    The buffer is empty when no answer was started before NO_SPEECH_S ran out,
+    so silence and background noise never reach Whisper.
+    """
+    with stage("record"):
+        with StreamingRecorder(max_s, wav=wav) as recorder:
+            samples = recorder.wait()
+    if not recorder.speech_detected:
+        logger.warning("No answer started within %.1fs; the recording is discarded", len(samples) / SAMPLE_RATE)
+        return samples[:0]
+    return samples
+
+
+if __name__ == "__main__":
+    wav = sys.argv[1] if len(sys.argv) > 1 else None
+    start = time.perf_counter()
+    samples = record_answer(10.0, wav=wav)
+    print(f"🎙️ Captured {len(samples) / SAMPLE_RATE:.2f}s of audio in {time.perf_counter() - start:.2f}s")
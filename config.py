@@ -0,0 +1,25 @@
+# config.py
+"""Who this machine's sessions belong to, shared by the capture scripts and the analytics layer.
+
+Kept free of heavy imports so `import speech` does not pull in numpy or the store.
+"""
+import os
+
+WORKER_ID = os.environ.get("WORKER_ID", "User001")  # whose reports, baseline and stored sessions a run makes
+WORKER_TEAM = os.environ.get("WORKER_TEAM")  # stored with each session saved from this machine
+
+NAME_BYTES = 32  # worker and team names are stored in fixed-size fields (store.py)
+
+
+def encode_name(value, field):
+    """`value` as the UTF-8 bytes the store keeps; ValueError if it does not fit."""
+    data = (value or "").encode("utf-8")
+    if len(data) > NAME_BYTES:
+        raise ValueError(f"{field} {value!r} is longer than {NAME_BYTES} bytes")
+    return data
+
+
+def check_names():
+    """Raise ValueError for a WORKER_ID or WORKER_TEAM the store cannot hold, before a session is run."""
+    encode_name(WORKER_ID, "WORKER_ID")
+    encode_name(WORKER_TEAM, "WORKER_TEAM")
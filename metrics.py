@@ -0,0 +1,132 @@
+# metrics.py
+"""Per-stage timing: wall time, CPU time and call counts.
+
+    with metrics.stage("asr"):
+        text = transcribe(...)
+
+Stages used across the repo: record, vad, asr, emotion, sentiment, moderation,
+moderation_prefilter, audio_emotion, tts, report_write, model_load and
+warmup (the throwaway inference after a background load).
+Recording is on by default; METRICS=0 turns every stage() into a shared
+no-op. Set METRICS_FILE to export at exit: a *.prom path is written in
+Prometheus textfile-collector format, anything else gets one JSON line per
+stage appended.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("METRICS_FILE")
+
+_stats = {}  # stage -> [count, wall_s, cpu_s, max_wall_s]
+_lock = threading.Lock()
+
+
+def record(name, wall_s, cpu_s=0.0):
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            _stats[name] = [1, wall_s, cpu_s, wall_s]
+        else:
+            entry[0] += 1
+            entry[1] += wall_s
+            entry[2] += cpu_s
+            entry[3] = max(entry[3], wall_s)
+
+
+class _Stage:
+    __slots__ = ("name", "wall", "cpu")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        # Process CPU time, so work in torch's intra-op threads is included;
+        # concurrent stages (pipelined sessions) therefore share it.
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Context manager timing one run of `name` (a no-op when metrics are disabled)."""
+    return _Stage(name) if ENABLED else _NULL_STAGE
+
+
+def snapshot():
+    """{stage: {"count", "wall_s", "cpu_s", "max_wall_s"}} recorded so far."""
+    with _lock:
+        return {
+            name: {"count": c, "wall_s": round(w, 6), "cpu_s": round(cpu, 6), "max_wall_s": round(m, 6)}
+            for name, (c, w, cpu, m) in _stats.items()
+        }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def prometheus_text():
+    """Recorded stages in Prometheus text exposition format."""
+    stats = snapshot()
+    lines = []
+    for metric, key, help_text in (
+        ("assessment_stage_calls_total", "count", "Completed runs of each stage."),
+        ("assessment_stage_wall_seconds_total", "wall_s", "Wall time spent in each stage."),
+        ("assessment_stage_cpu_seconds_total", "cpu_s", "Process CPU time spent in each stage."),
+        ("assessment_stage_max_wall_seconds", "max_wall_s", "Slowest single run of each stage."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {'gauge' if key == 'max_wall_s' else 'counter'}")
+        for name, s in sorted(stats.items()):
+            lines.append(f'{metric}{{stage="{name}"}} {s[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path):
+    # The textfile collector may read at any moment, so replace the file atomically
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def export_jsonl(path):
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    with open(path, "a", encoding="utf-8") as f:
+        for name, s in snapshot().items():
+            f.write(json.dumps({"time": timestamp, "pid": os.getpid(), "stage": name, **s}) + "\n")
+
+
+def export(path):
+    """Write the recorded stages to `path`: Prometheus text for *.prom, JSON lines otherwise."""
+    if path.endswith(".prom"):
+        export_prometheus(path)
+    else:
+        export_jsonl(path)
+
+
+if ENABLED and METRICS_FILE:
+    atexit.register(lambda: _stats and export(METRICS_FILE))
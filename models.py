@@ -0,0 +1,268 @@
+# models.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# Every model the assessment uses, keyed by a short registry name.
+MODEL_SPECS = {
+    "whisper": {
+        "task": "automatic-speech-recognition",
+        "model": "openai/whisper-base",
+        "generate_kwargs": {"language": "en"},
+    },
+    # Closed-form (Likert, yes/no) answers, see routing.py
+    "whisper_tiny": {
+        "task": "automatic-speech-recognition",
+        "model": "openai/whisper-tiny.en",
+    },
+    "emotion": {
+        "task": "text-classification",
+        "model": "bhadresh-savani/distilbert-base-uncased-emotion",
+        "top_k": 1,
+    },
+    "go_emotion": {
+        "task": "text-classification",
+        "model": "bhadresh-savani/bert-base-go-emotion",
+        "return_all_scores": True,
+    },
+    "toxic": {
+        "task": "text-classification",
+        "model": "unitary/toxic-bert",
+        "return_all_scores": True,
+    },
+    "audio_emotion": {
+        "task": "audio-classification",
+        "model": "superb/hubert-base-superb-er",
+    },
+}
+
+# Inference backend for the BERT-family text classifiers:
+#   torch - float32 PyTorch (default)
+#   int8  - PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx  - ONNX Runtime graph exported with optimum (cached under ONNX_CACHE_DIR)
+TEXT_MODELS = ("emotion", "go_emotion", "toxic")
+TEXT_BACKENDS = ("torch", "int8", "onnx")
+TEXT_BACKEND = os.environ.get("TEXT_BACKEND", "torch")
+if TEXT_BACKEND not in TEXT_BACKENDS:
+    raise ValueError(f"Unknown TEXT_BACKEND={TEXT_BACKEND!r} (expected one of {', '.join(TEXT_BACKENDS)})")
+ONNX_CACHE_DIR = os.environ.get(
+    "ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".onnx_models")
+)
+
+# Upper bound on the summed weight size of resident models (MB). 0 means unlimited.
+MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0"))
+
+_loaded = OrderedDict()  # name -> pipeline, least recently used first
+_sizes = {}              # name -> weight size in MB
+_last_used = {}          # name -> time.monotonic() of last get_pipeline()
+_lock = threading.RLock()
+_build_locks = defaultdict(threading.Lock)
+_factories = {}          # name -> callable() replacing the transformers pipeline
+
+
+def backend_for(name):
+    return TEXT_BACKEND if name in TEXT_MODELS else "torch"
+
+
+def model_id(name):
+    """Identity of the weights behind a registry name, for keying cached results."""
+    backend = backend_for(name)
+    model = MODEL_SPECS[name]["model"]
+    return model if backend == "torch" else f"{model}@{backend}"
+
+
+def model_settings(name):
+    """Canonical JSON of the pipeline options that can change a model's output."""
+    options = {k: v for k, v in MODEL_SPECS[name].items() if k not in ("task", "model")}
+    return json.dumps(options, sort_keys=True)
+
+
+def _weight_size_mb(pipe):
+    # Parameters only: int8-packed Linear weights and ONNX Runtime sessions are not
+    # counted, so quantized models under-report and are evicted last.
+    model = getattr(pipe, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0.0
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    return total / (1024 * 1024)
+
+
+def set_text_backend(backend):
+    """Switch the text classifiers to another backend; loaded ones are rebuilt on next use."""
+    global TEXT_BACKEND
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend: {backend} (expected one of {', '.join(TEXT_BACKENDS)})")
+    with _lock:
+        TEXT_BACKEND = backend
+        for name in TEXT_MODELS:
+            release(name)
+
+
+def set_factory(name, factory=None):
+    """Build `name` with factory() instead of transformers (e.g. a stub); None restores it.
+
+    The currently loaded instance, if any, is released.
+    """
+    with _lock:
+        if factory is None:
+            _factories.pop(name, None)
+        else:
+            _factories[name] = factory
+        release(name)
+
+
+def _build(name):
+    if name in _factories:
+        return _factories[name]()
+    return build(name, backend_for(name))
+
+
+def build(name, backend="torch"):
+    """Construct a fresh, unregistered pipeline for `name` on the given backend."""
+    from transformers import pipeline  # deferred: importing transformers/torch takes seconds
+
+    spec = dict(MODEL_SPECS[name])
+    task = spec.pop("task")
+    if backend == "torch":
+        return pipeline(task, **spec)
+    if name not in TEXT_MODELS:
+        raise ValueError(f"Backend {backend} is only available for {', '.join(TEXT_MODELS)}")
+
+    if backend == "int8":
+        import torch
+
+        pipe = pipeline(task, **spec)
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipe
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise ImportError("TEXT_BACKEND=onnx needs optimum with ONNX Runtime: "
+                              "pip install 'optimum[onnxruntime]' (see requirements-optional.txt)") from e
+        from transformers import AutoTokenizer
+
+        model_name = spec.pop("model")
+        export_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+        if os.path.isdir(export_dir):
+            model = ORTModelForSequenceClassification.from_pretrained(export_dir)
+        else:
+            model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+            model.save_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        return pipeline(task, model=model, tokenizer=tokenizer, **spec)
+
+    raise ValueError(f"Unknown text backend: {backend}")
+
+
+def get_pipeline(name):
+    """Return the shared pipeline for `name`, building it on first use."""
+    if name not in MODEL_SPECS:
+        raise KeyError(f"Unknown model: {name}")
+
+    with _lock:
+        if name in _loaded:
+            _loaded.move_to_end(name)
+            _last_used[name] = time.monotonic()
+            return _loaded[name]
+        # Created under the registry lock, so concurrent misses share one per-name lock
+        build_lock = _build_locks[name]
+
+    # Build outside the registry lock so other models stay usable meanwhile;
+    # the per-name lock stops two threads from loading the same weights.
+    with build_lock:
+        with _lock:
+            if name in _loaded:
+                _loaded.move_to_end(name)
+                _last_used[name] = time.monotonic()
+                return _loaded[name]
+
+        from metrics import stage
+
+        with stage("model_load"):
+            pipe = _build(name)
+
+        with _lock:
+            _loaded[name] = pipe
+            _sizes[name] = _weight_size_mb(pipe)
+            _last_used[name] = time.monotonic()
+            _enforce_budget(keep=name)
+            return pipe
+
+
+def _enforce_budget(keep=None):
+    if MEMORY_BUDGET_MB <= 0:
+        return
+    while sum(_sizes.values()) > MEMORY_BUDGET_MB:
+        victim = next((n for n in _loaded if n != keep), None)
+        if victim is None:
+            break
+        release(victim)
+
+
+def set_memory_budget(megabytes):
+    """Change the memory budget and evict least recently used models to fit."""
+    global MEMORY_BUDGET_MB
+    with _lock:
+        MEMORY_BUDGET_MB = float(megabytes)
+        _enforce_budget()
+
+
+def release(name):
+    """Drop a model from the registry. It is rebuilt on its next use."""
+    with _lock:
+        _loaded.pop(name, None)
+        _sizes.pop(name, None)
+        _last_used.pop(name, None)
+
+
+def evict_idle(max_idle_seconds):
+    """Drop every model that has not been used for `max_idle_seconds`."""
+    now = time.monotonic()
+    with _lock:
+        idle = [n for n, t in _last_used.items() if now - t > max_idle_seconds]
+        for name in idle:
+            release(name)
+    return idle
+
+
+def clear():
+    with _lock:
+        for name in list(_loaded):
+            release(name)
+
+
+def loaded_models():
+    """Resident models and their weight size in MB, least recently used first."""
+    with _lock:
+        return [(name, round(_sizes.get(name, 0.0), 1)) for name in _loaded]
+
+
+def _length_key(pipe, text):
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if tokenizer is None:
+        return len(text)
+    return len(tokenizer(text)["input_ids"])
+
+
+def run_batched(name, inputs, batch_size=32):
+    """Run the `name` pipeline over many texts in padded, length-bucketed batches.
+
+    Inputs are sorted by token length so each padded batch holds texts of
+    similar size; results come back in the original input order.
+    """
+    inputs = list(inputs)
+    if not inputs:
+        return []
+    pipe = get_pipeline(name)
+    order = sorted(range(len(inputs)), key=lambda i: _length_key(pipe, inputs[i]))
+    results = [None] * len(inputs)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        outputs = pipe([inputs[i] for i in bucket], batch_size=len(bucket))
+        for i, output in zip(bucket, outputs):
+            results[i] = output
+    return results
@@ -1,16 +1,168 @@
 # moderation.py
-from transformers import pipeline
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from cache import memoize_texts
+from metrics import stage
+from models import get_pipeline, run_batched
 
-moderator = pipeline("text-classification", model="unitary/toxic-bert", return_all_scores=True)
+logger = logging.getLogger(__name__)
 
-def analyze_moderation(text):
-    print("\n🚨 Running moderation analysis on:", text)
+TOXIC_LABELS = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
 
-    results = moderator(text)
-    moderation_dict = {res['label']: round(res['score'], 4) for res in results[0]}
+# Lexical prefilter in front of toxic-bert:
+#   off    - every answer goes through the model (default)
+#   on     - answers the prefilter calls clean get zero scores without a forward pass
+#   shadow - the model still scores everything; prefilter decisions are only
+#            compared against it to measure the false-negative rate
+MODERATION_PREFILTER = os.environ.get("MODERATION_PREFILTER", "off")
+MODERATION_LEXICON = os.environ.get("MODERATION_LEXICON")  # extra terms, one per line
+PREFILTER_MAX_WORDS = int(os.environ.get("PREFILTER_MAX_WORDS", "12"))
+PREFILTER_THRESH = 0.01  # the sentiment report flags moderation scores from here up
 
-    print("\n🛡️ Moderation Results:")
-    for label, score in moderation_dict.items():
-        print(f"{label}: {score}")
+STATUS_MODEL = "model"
+STATUS_SKIPPED = "skipped: prefilter clean"
+STATUS_ERROR = "error"
+STATUSES = [STATUS_MODEL, STATUS_SKIPPED, STATUS_ERROR]  # stored by index (store.py)
 
+# A trailing * matches any ending ("kill*" also catches "killed", "killing");
+# other terms must match a whole word, so "ass" does not fire on "assessment".
+# Stems that start common benign words ("cocktail", "Dickens", "stable",
+# "arsenal", "rapeseed", "gunther") list their inflections instead, so shadow-mode
+# skip rates are not skewed by answers the prefilter sends for no reason.
+LEXICON = [
+    # profanity and obscenity
+    "fuck*", "motherf*", "shit*", "bullshit*", "bitch*", "bastard*", "asshole*", "ass", "arse",
+    "arses", "arsehole*", "damn*", "crap", "crappy", "dick", "dicks", "dickhead*", "piss*", "cunt*",
+    "cock", "cocks", "wtf", "stfu", "bloody", "hell", "porn*", "rape", "raped", "rapes", "raping",
+    "rapist*", "whore*", "slut*", "horny", "suck*", "sex", "sexy", "sexual*", "nude*",
+    # insults
+    "idiot*", "stupid*", "moron*", "dumb*", "loser*", "retard", "retarded", "retards", "jerk",
+    "jerks", "pathetic", "worthless", "useless", "ugly", "fat", "trash", "garbage", "scum*",
+    "freak*", "clown*", "imbecile*", "shut up",
+    # threats and violence
+    "kill*", "murder*", "shoot*", "shot", "stab", "stabs", "stabbed", "stabbing", "hurt*", "punch*",
+    "beat", "beats", "beating*", "beaten", "die", "dies", "dying", "dead", "destroy*", "attack*",
+    "bomb*", "gun", "guns", "gunned", "gunman", "gunmen", "knife", "knives", "strangl*", "chok*",
+    "burn*", "smash", "smashed", "smashes", "slap", "slaps", "slapped", "slapping", "revenge", "weapon*",
+    # hate
+    "hate*", "racis*", "nazi*", "terroris*", "disgusting", "vermin", "inferior", "go back to",
+]
+
+_MASKED_WORD = re.compile(r"\w[*#@$%!]+\w")  # "f**k", "sh#t"
+_SHOUTED_WORD = re.compile(r"\b[A-Z]{3,}\b")
+
+# Prefilter outcomes so far: screened, skipped and sent; in shadow mode also the
+# answers the model flagged and the flagged ones the prefilter would have skipped
+prefilter_stats = Counter()
+_stats_lock = threading.Lock()  # moderate() runs on batcher and service threads
+
+def _compile_lexicon(terms):
+    patterns = []
+    for term in terms:
+        term = term.strip().lower()
+        if not term or term.startswith("#"):
+            continue
+        word = r"\s+".join(re.escape(part) for part in term.rstrip("*").split())
+        patterns.append(rf"\b{word}" if term.endswith("*") else rf"\b{word}\b")
+    # Longest first, so alternation prefers the most specific term
+    return re.compile("|".join(sorted(patterns, key=len, reverse=True)), re.IGNORECASE)
+
+def _load_lexicon():
+    terms = list(LEXICON)
+    if MODERATION_LEXICON:
+        with open(MODERATION_LEXICON, encoding="utf-8") as f:
+            terms.extend(f.read().splitlines())
+    return _compile_lexicon(terms)
+
+_lexicon = _load_lexicon()
+
+def needs_model(text):
+    """False only for answers the prefilter is confident are clean: short, no lexicon hit, nothing masked or shouted."""
+    if len(text.split()) > PREFILTER_MAX_WORDS:
+        return True  # longer answers can be toxic without a single listed word
+    if _lexicon.search(text) or _MASKED_WORD.search(text):
+        return True
+    return len(_SHOUTED_WORD.findall(text)) >= 2 or text.count("!") >= 3
+
+def _to_moderation_dict(scores):
+    return {res['label']: round(res['score'], 4) for res in scores}
+
+def _classify(texts, batch_size=32):
+    get_pipeline("toxic")  # a first-use load is timed as model_load, not as moderation
+    with stage("moderation"):
+        results = run_batched("toxic", texts, batch_size)
+    return [_to_moderation_dict(scores) for scores in results]
+
+def _skipped_result():
+    return {label: 0.0 for label in TOXIC_LABELS}
+
+def _count(**amounts):
+    with _stats_lock:
+        prefilter_stats.update(amounts)
+
+def moderate(texts, batch_size=32, mode=None):
+    """(results, statuses) for `texts`; status is STATUS_MODEL or STATUS_SKIPPED per text."""
+    mode = mode or MODERATION_PREFILTER
+    texts = list(texts)
+    compute = lambda missing: _classify(missing, batch_size)
+
+    if mode == "off":
+        return memoize_texts("toxic", texts, compute), [STATUS_MODEL] * len(texts)
+
+    with stage("moderation_prefilter"):
+        send = [needs_model(t) for t in texts]
+    _count(screened=len(texts), skipped=send.count(False))
+
+    if mode == "shadow":
+        results = memoize_texts("toxic", texts, compute)
+        flagged = false_negatives = 0
+        for text, sent, result in zip(texts, send, results):
+            if max(result.values(), default=0.0) < PREFILTER_THRESH:
+                continue
+            flagged += 1
+            if not sent:
+                false_negatives += 1
+                logger.debug("Prefilter missed: %r -> %s", text, result)
+        _count(flagged=flagged, false_negatives=false_negatives, sent=len(texts))
+        return results, [STATUS_MODEL] * len(texts)
+
+    to_model = [t for t, s in zip(texts, send) if s]
+    _count(sent=len(to_model))
+    model_results = iter(memoize_texts("toxic", to_model, compute) if to_model else [])
+    results = [next(model_results) if s else _skipped_result() for s in send]
+    return results, [STATUS_MODEL if s else STATUS_SKIPPED for s in send]
+
+def prefilter_summary():
+    """Skip rate, and in shadow mode how many model-flagged answers the prefilter would have skipped."""
+    with _stats_lock:
+        stats = Counter(prefilter_stats)
+    screened, skipped = stats["screened"], stats["skipped"]
+    flagged, false_negatives = stats["flagged"], stats["false_negatives"]
+    return {
+        "screened": screened,
+        "skipped": skipped,
+        "skip_rate": round(skipped / screened, 4) if screened else 0.0,
+        "flagged": flagged,
+        "false_negatives": false_negatives,
+        "false_negative_rate": round(false_negatives / flagged, 4) if flagged else 0.0,
+    }
+
+def analyze_moderation(text, with_status=False):
+    """Toxic-bert scores for `text`; with_status=True returns (scores, status), since a
+    prefilter-skipped answer gets the same zero scores as one the model found clean."""
+    logger.debug("Running moderation analysis on: %s", text)
+
+    (moderation_dict,), (status,) = moderate([text])
+
+    logger.debug("Moderation Results: %s (%s)", moderation_dict, status)
+    if with_status:
+        return moderation_dict, status
     return moderation_dict  # ✅ Important!
+
+def analyze_many(texts, batch_size=32, with_status=False):
+    """Batch version of analyze_moderation: one dict per text, in order, no console output."""
+    results, statuses = moderate(texts, batch_size)
+    return (results, statuses) if with_status else results
@@ -0,0 +1,90 @@
+# parity.py
+"""Check that a text classifier backend scores like the float32 PyTorch baseline.
+
+    python parity.py --backend int8
+    python parity.py --backend onnx --models toxic --tolerance 0.01
+    python parity.py --backend int8 --texts answers.txt   # one transcript per line
+
+For every model the candidate backend and float32 torch score the same texts;
+the check fails (exit status 1) if any label probability differs by more than
+--tolerance. Top-label agreement and per-text latency are reported alongside.
+"""
+import argparse
+import sys
+import time
+
+import models
+
+# Short answers like those in the saved reports, plus longer and hostile ones
+DEFAULT_TEXTS = [
+    "I am feeling good.",
+    "Yes.",
+    "See you tomorrow.",
+    "Oh, no.",
+    "Thank you.",
+    "I'm exhausted, I barely slept and my back hurts.",
+    "Honestly I'm worried about the new shift schedule and nobody listens.",
+    "I'm ready to work, let's get started.",
+    "This is stupid and I hate everyone here.",
+    "I had a great weekend with my family and I feel motivated.",
+]
+
+
+def _all_scores(pipe, texts):
+    results = pipe(texts, batch_size=len(texts), top_k=None)
+    return [{r["label"]: r["score"] for r in result} for result in results]
+
+
+def check_model(name, backend, texts, tolerance):
+    reference = models.build(name, "torch")
+    candidate = models.build(name, backend)
+
+    timings = {}
+    scores = {}
+    for label, pipe in (("torch", reference), (backend, candidate)):
+        _all_scores(pipe, texts[:1])  # warm up
+        start = time.perf_counter()
+        scores[label] = _all_scores(pipe, texts)
+        timings[label] = (time.perf_counter() - start) * 1000 / len(texts)
+
+    max_diff = 0.0
+    top_agree = 0
+    for ref, cand in zip(scores["torch"], scores[backend]):
+        max_diff = max(max_diff, max(abs(ref[l] - cand.get(l, 0.0)) for l in ref))
+        top_agree += max(ref, key=ref.get) == max(cand, key=cand.get)
+
+    return {
+        "model": name,
+        "max_abs_diff": max_diff,
+        "top_label_agreement": top_agree / len(texts),
+        "torch_ms_per_text": timings["torch"],
+        "backend_ms_per_text": timings[backend],
+        "ok": max_diff <= tolerance,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a text classifier backend against float32 torch.")
+    parser.add_argument("--backend", choices=[b for b in models.TEXT_BACKENDS if b != "torch"], required=True)
+    parser.add_argument("--models", default=",".join(models.TEXT_MODELS))
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max allowed probability difference")
+    parser.add_argument("--texts", help="file with one transcript per line (default: built-in samples)")
+    args = parser.parse_args()
+
+    texts = DEFAULT_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    failed = False
+    for name in [n.strip() for n in args.models.split(",") if n.strip()]:
+        result = check_model(name, args.backend, texts, args.tolerance)
+        failed |= not result["ok"]
+        print(f"{'✅' if result['ok'] else '❌'} {name:<11} max |Δp| {result['max_abs_diff']:.4f}  "
+              f"top-label agreement {result['top_label_agreement']:.0%}  "
+              f"{result['torch_ms_per_text']:.1f} → {result['backend_ms_per_text']:.1f} ms/text")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
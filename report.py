@@ -1,6 +1,7 @@
 # report.py
 from datetime import datetime
 import json
+from metrics import stage
 
 def generate_report(user_responses, user_id="User001"):
     report_lines = []
@@ -27,7 +28,7 @@ def generate_report(user_responses, user_id="User001"):
 
     report = "\n".join(report_lines)
     
-    with open("voice_report.txt", "w", encoding="utf-8") as f:
+    with stage("report_write"), open("voice_report.txt", "w", encoding="utf-8") as f:
         f.write(report)
     print("\n📁 Report saved as: voice_report.txt")
 
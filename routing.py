@@ -0,0 +1,298 @@
+# routing.py
+"""Question-type-aware ASR routing.
+
+Likert and yes/no answers only need to be mapped onto their scale, so they do
+not need whisper-base followed by an emotion classifier. With ASR_ROUTING on, closed-form
+answers are transcribed by whisper-tiny with the scale's wording as the
+decoder prompt (biasing it towards "agree", "strongly disagree", "yes", ...)
+and the transcript is mapped straight to a score. Open-ended answers, and
+closed ones whose transcript names no scale point, take the full path.
+
+    ASR_ROUTING=off     every answer takes the full path (default)
+    ASR_ROUTING=on      closed-form answers are scored by their route
+    ASR_ROUTING=shadow  both paths run and the full path's score is used; the
+                        route is only timed and compared against it
+
+    python routing.py --kind likert answers/*.wav     # shadow-compare recorded answers
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from metrics import stage
+
+ASR_ROUTING = os.environ.get("ASR_ROUTING", "off")
+CLOSED_MODEL = "whisper_tiny"
+
+LIKERT, YES_NO, OPEN = "likert", "yes_no", "open"
+CLOSED_KINDS = (LIKERT, YES_NO)
+FULL = "full"
+
+# Decoder prompts: the words a closed-form answer is expected to use
+PROMPTS = {
+    LIKERT: "Strongly disagree. Disagree. Neutral. Agree. Strongly agree.",
+    YES_NO: "Yes. No.",
+}
+
+# Answer wording -> score (1-5); None marks hedges that name no answer. Whole
+# phrases win over the words they contain ("not at all", "i have never").
+# Intensifiers and negators are not scores of their own: they modify the term
+# next to them ("absolutely disagree" -> 1, "don't agree" -> 2), see scale_answer.
+SCALE_TERMS = {
+    LIKERT: {
+        4: ["agree", "somewhat agree", "mostly", "yes", "yeah"],
+        3: ["neutral", "neither", "not sure", "unsure", "maybe", "sometimes", "so so", "kind of"],
+        2: ["disagree", "somewhat disagree", "not really", "no", "not quite"],
+        1: ["not at all", "never", "absolutely not", "definitely not", "certainly not"],
+    },
+    YES_NO: {
+        5: ["yes", "yeah", "yep", "yup", "i have", "i did", "i do", "correct", "of course", "sure"],
+        1: ["no", "nope", "nah", "never", "none", "not", "i haven't", "i have not", "i didn't",
+            "i did not", "i don't", "i do not", "i have never", "i've never", "i never", "of course not"],
+        None: ["not sure", "unsure", "i'm not sure", "not certain", "i don't know", "i do not know",
+               "maybe", "i can't remember", "i don't remember"],
+    },
+}
+INTENSIFIERS = ["absolutely", "definitely", "totally", "completely", "fully", "strongly", "certainly",
+                "really", "very much"]
+NEGATORS = ["not", "don't", "do not", "doesn't", "does not"]
+# A number only counts as a Likert answer when it stands alone ("Four.", "I'd say four out of
+# five"), not inside a phrase like "no one"
+NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "1": 1, "2": 2, "3": 3, "4": 4, "5": 5}
+NOT_ANSWERS = ["no one", "no doubt", "no problem", "no matter"]  # "no" that is not a "no"
+
+# Per route ("likert", "yes_no", "full"): answers, seconds, fallbacks to the full
+# path, and in shadow mode compared, agreed, scale_agreed, word_errors, words, full_seconds
+routing_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()  # answers are scored on pool and batcher threads
+
+
+def _alternation(phrases):
+    # Longest first, so alternation prefers the most specific phrase
+    return "|".join(re.escape(p).replace(r"\ ", r"\s+") for p in sorted(phrases, key=len, reverse=True))
+
+
+def _compile(terms):
+    scores = {p: score for score, ps in terms.items() for p in ps}
+    intensifier = _alternation(INTENSIFIERS)
+    pattern = (rf"\b(?:(?P<neg>{_alternation(NEGATORS)})\s+)?(?:(?P<int>{intensifier})\s+)?"
+               rf"(?P<term>{_alternation(scores)})(?!\w)(?:[\s,]+(?P<post>{intensifier})(?!\w))?")
+    return re.compile(pattern, re.IGNORECASE), scores
+
+
+_matchers = {kind: _compile(terms) for kind, terms in SCALE_TERMS.items()}
+_not_answers = re.compile(rf"\b(?:{_alternation(NOT_ANSWERS)})(?!\w)", re.IGNORECASE)
+_intensifiers_only = re.compile(
+    rf"^\W*(?:{_alternation(INTENSIFIERS)})(?:\W+(?:{_alternation(INTENSIFIERS)}|so))*\W*$", re.IGNORECASE)
+_number_clause = re.compile(
+    rf"^\s*(?:(?:i'd|i would|i'll|i will|i) say\s+|(?:probably|about|around|maybe)\s+)?"
+    rf"(?P<number>{_alternation(NUMBERS)})(?:\s+out of (?:five|5))?\s*$", re.IGNORECASE)
+
+
+def question_type(question):
+    """LIKERT for a statement to rate, OPEN for a question; yes/no questions must be marked by the caller."""
+    return OPEN if question.rstrip().endswith("?") else LIKERT
+
+
+def is_closed(kind):
+    return kind in CLOSED_KINDS
+
+
+def _term_score(match, scores):
+    """Score of one matched term with the negator or intensifier around it applied."""
+    term = re.sub(r"\s+", " ", match.group("term").lower())
+    score = scores[term]
+    neg = match.group("neg")
+    if neg:
+        phrase = f"{neg.lower()} {term}"
+        if not match.group("int") and phrase in scores:
+            return scores[phrase]  # "not sure" is a phrase of its own, not a negated "sure"
+        return None if score is None else 6 - score
+    if score is not None and (match.group("int") or match.group("post")):
+        return 5 if score > 3 else 1 if score < 3 else 3
+    return score
+
+
+def scale_answer(text, kind):
+    """The score (1-5) `text` gives on `kind`'s scale, or None when it names no scale point (or hedges).
+
+    On the Likert scale a number on its own counts first, then the most specific
+    phrase in the answer, then the strongest; a yes/no answer must name only one side.
+    """
+    text = _not_answers.sub(" ", text.replace("’", "'"))
+    if _intensifiers_only.match(text):
+        return 5  # "Absolutely." on its own agrees
+    if kind == LIKERT:
+        for clause in re.split(r"[.,;:!?]+", text):
+            number = _number_clause.match(clause)
+            if number:
+                return NUMBERS[number.group("number").lower()]
+    pattern, scores = _matchers[kind]
+    found = [(m.group(0), _term_score(m, scores)) for m in pattern.finditer(text)]
+    if not found:
+        return None
+    if kind == YES_NO:
+        sides = {score for _, score in found}
+        return sides.pop() if len(sides) == 1 else None
+    found = [(phrase, score) for phrase, score in found if score is not None]
+    if not found:
+        return None
+    return max(found, key=lambda f: (len(f[0]), abs(f[1] - 3)))[1]
+
+
+def _words(text):
+    return [w for w in re.sub(r"[^\w' ]", " ", text.lower()).split()]
+
+
+def word_errors(reference, hypothesis):
+    """(edits, reference length): word-level Levenshtein distance, the numerator of WER."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1], len(ref)
+
+
+_prompt_echoes = {
+    kind: re.compile(r"^\W*" + r"\W+".join(re.findall(r"\w+", prompt)) + r"(?!\w)\W*", re.IGNORECASE)
+    for kind, prompt in PROMPTS.items()
+}
+
+
+def transcribe_closed(samples, kind):
+    """Transcribe a trimmed 16 kHz answer with whisper-tiny, prompted with `kind`'s scale wording."""
+    from audio import asr_input
+    from models import get_pipeline
+
+    pipe = get_pipeline(CLOSED_MODEL)
+    kwargs = {}
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if hasattr(tokenizer, "get_prompt_ids"):
+        prompt_ids = tokenizer.get_prompt_ids(PROMPTS[kind], return_tensors="pt")
+        kwargs["generate_kwargs"] = {"prompt_ids": prompt_ids}
+    with stage("asr"):
+        text = pipe(asr_input(samples), **kwargs)["text"].strip()
+    # Some transformers versions return the prompt in front of the transcript,
+    # not always with the same spacing, case or punctuation
+    return _prompt_echoes[kind].sub("", text).strip()
+
+
+def answer_closed(audio_data, kind):
+    """(transcript, score or None) of a closed-form answer through its route."""
+    from voice import trim_answer
+
+    samples, _ = trim_answer(audio_data)
+    if not len(samples):
+        return "", None
+    text = transcribe_closed(samples, kind)
+    return text, scale_answer(text, kind)
+
+
+def score_answer(audio_data, kind, full_path, mode=None):
+    """Score (1-5) of one recorded answer, routed on `kind`.
+
+    `full_path(audio_data)` returns (transcript, score) through whisper-base and
+    the emotion classifier; it scores open-ended answers, closed-form answers
+    the route could not map, and in shadow mode every answer.
+    """
+    mode = mode or ASR_ROUTING
+
+    def add(route, **amounts):
+        with _stats_lock:
+            routing_stats[route].update(amounts)
+
+    def timed_full():
+        start = time.perf_counter()
+        text, score = full_path(audio_data)
+        return text, score, time.perf_counter() - start
+
+    if mode == "off" or not is_closed(kind):
+        _, score, seconds = timed_full()
+        add(FULL, answers=1, seconds=seconds)
+        return score
+
+    start = time.perf_counter()
+    text, score = answer_closed(audio_data, kind)
+    seconds = time.perf_counter() - start
+
+    if mode == "shadow":
+        full_text, full_score, full_seconds = timed_full()
+        errors, words = word_errors(full_text, text)
+        add(kind, answers=1, seconds=seconds, full_seconds=full_seconds, compared=1,
+            agreed=int(score == full_score),
+            # Same scale mapping on the whisper-base transcript: isolates the cost of the smaller model
+            scale_agreed=int(score == scale_answer(full_text, kind)),
+            word_errors=errors, words=words, fallbacks=int(score is None))
+        return full_score
+
+    if score is None:
+        # The route's latency includes its fallbacks: that is what a worker waits for
+        _, score, full_seconds = timed_full()
+        add(kind, answers=1, seconds=seconds + full_seconds, fallbacks=1)
+        return score
+    add(kind, answers=1, seconds=seconds)
+    return score
+
+
+def routing_summary():
+    """Per route: answers, mean latency, fallback rate and, from shadow runs, agreement with the full path."""
+    summary = {}
+    with _stats_lock:
+        stats = {route: Counter(s) for route, s in routing_stats.items()}
+    for route, s in stats.items():
+        answers = s["answers"]
+        if not answers:
+            continue
+        entry = {"answers": answers, "mean_ms": round(1000 * s["seconds"] / answers, 1)}
+        if route != FULL:
+            entry["fallback_rate"] = round(s["fallbacks"] / answers, 4)
+        if s["compared"]:
+            compared = s["compared"]
+            full_ms = 1000 * s["full_seconds"] / compared
+            entry.update({
+                "full_path_mean_ms": round(full_ms, 1),
+                "speedup": round(full_ms / entry["mean_ms"], 2) if entry["mean_ms"] else None,
+                "score_agreement": round(s["agreed"] / compared, 4),
+                "scale_agreement": round(s["scale_agreed"] / compared, 4),
+                "wer_vs_full": round(s["word_errors"] / s["words"], 4) if s["words"] else 0.0,
+            })
+        summary[route] = entry
+    return summary
+
+
+def print_summary():
+    for route, s in routing_summary().items():
+        line = f"   {route:<7} {s['answers']:4d} answers  {s['mean_ms']:8.1f} ms"
+        if "fallback_rate" in s:
+            line += f"  fallback {s['fallback_rate']:.0%}"
+        if "score_agreement" in s:
+            line += (f"  | full path {s['full_path_mean_ms']:.1f} ms ({s['speedup']}x)  score agreement "
+                     f"{s['score_agreement']:.0%}  scale agreement {s['scale_agreement']:.0%}  "
+                     f"WER {s['wer_vs_full']:.1%}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare routed ASR against the full path on recorded answers.")
+    parser.add_argument("paths", nargs="+", help="recorded answers (WAV, FLAC, ...)")
+    parser.add_argument("--kind", choices=[LIKERT, YES_NO], default=LIKERT)
+    args = parser.parse_args()
+
+    from audio import load_audio
+    from VoiceText import full_path_score
+
+    for path in args.paths:
+        score_answer(load_audio(path), args.kind, full_path_score, mode="shadow")
+    print(f"🔀 Routing shadow comparison over {len(args.paths)} answers:")
+    print_summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
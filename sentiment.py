@@ -1,16 +1,84 @@
 # sentiment.py
-from transformers import pipeline
+from collections import Counter
+import logging
+from cache import memoize_texts
+from metrics import stage
+from models import get_pipeline, run_batched
 
-classifier = pipeline("text-classification", model="bhadresh-savani/bert-base-go-emotion", return_all_scores=True)
+logger = logging.getLogger(__name__)
 
-def analyze_sentiment(text):
-    print("\n🔍 Running sentiment check on:", text)
+GO_EMOTION_LABELS = [
+    "admiration", "amusement", "anger", "annoyance", "approval", "caring", "confusion",
+    "curiosity", "desire", "disappointment", "disapproval", "disgust", "embarrassment",
+    "excitement", "fear", "gratitude", "grief", "joy", "love", "nervousness", "optimism",
+    "pride", "realization", "relief", "remorse", "sadness", "surprise", "neutral",
+]
+
+# Coarse six-class label set of distilbert-base-uncased-emotion, as groups of go-emotion labels.
+# "neutral" has no counterpart there and is left out of the vote.
+GO_EMOTION_TO_EMOTION = {
+    "joy": ["admiration", "amusement", "approval", "excitement", "gratitude", "joy",
+            "optimism", "pride", "relief"],
+    "love": ["caring", "desire", "love"],
+    "anger": ["anger", "annoyance", "disapproval", "disgust"],
+    "sadness": ["disappointment", "embarrassment", "grief", "remorse", "sadness"],
+    "fear": ["fear", "nervousness"],
+    "surprise": ["confusion", "curiosity", "realization", "surprise"],
+}
+
+# Labels counted towards the readiness score when among an answer's top three
+POSITIVE_EMOTIONS = {"joy", "gratitude", "admiration", "optimism", "love", "hope", "approval", "relief", "pride"}
+NEGATIVE_EMOTIONS = {"anger", "sadness", "disgust", "fear", "grief", "disappointment", "disapproval", "annoyance", "remorse", "nervousness"}
+
+# Agreement between derived and DistilBERT labels seen in validation mode: (derived, reference) -> count
+emotion_agreement = Counter()
 
-    results = classifier(text)
-    emotion_dict = {emotion['label']: round(emotion['score'] * 100, 2) for emotion in results[0]}
+def _to_emotion_dict(scores):
+    return {emotion['label']: round(emotion['score'] * 100, 2) for emotion in scores}
+
+def _classify(texts, batch_size=32):
+    get_pipeline("go_emotion")  # a first-use load is timed as model_load, not as sentiment
+    with stage("sentiment"):
+        results = run_batched("go_emotion", texts, batch_size)
+    return [_to_emotion_dict(scores) for scores in results]
+
+def analyze_sentiment(text):
+    logger.debug("Running sentiment check on: %s", text)
 
-    print("\n🧠 Sentiment Results:")
-    for label, score in emotion_dict.items():
-        print(f"{label}: {score}")
+    emotion_dict = memoize_texts("go_emotion", [text], _classify)[0]
 
+    logger.debug("Sentiment Results: %s", emotion_dict)
     return emotion_dict  # ✅ You missed this line
+
+def analyze_many(texts, batch_size=32):
+    """Batch version of analyze_sentiment: one dict per text, in order, no console output."""
+    return memoize_texts("go_emotion", texts, lambda missing: _classify(missing, batch_size))
+
+def derive_emotion(sentiment_dict, default="neutral"):
+    """Coarse emotion label from go-emotion scores, replacing a DistilBERT forward pass."""
+    totals = {
+        emotion: sum(sentiment_dict.get(label, 0.0) for label in labels)
+        for emotion, labels in GO_EMOTION_TO_EMOTION.items()
+    }
+    emotion, total = max(totals.items(), key=lambda x: x[1])
+    return emotion if total > 0 else default
+
+def record_emotion_agreement(derived, reference):
+    emotion_agreement[(derived, reference)] += 1
+
+def agreement_summary():
+    """(agreed, total, rate) over everything recorded with record_emotion_agreement."""
+    total = sum(emotion_agreement.values())
+    agreed = sum(n for (derived, reference), n in emotion_agreement.items() if derived == reference)
+    return agreed, total, (agreed / total if total else 0.0)
+
+def validate_derived_emotion(texts, batch_size=32):
+    """Score `texts` with both go-emotion and DistilBERT and record how often the labels agree."""
+    from voice import top_emotion_label
+
+    texts = [t for t in texts if t]
+    derived = [derive_emotion(scores) for scores in analyze_many(texts, batch_size)]
+    reference = [top_emotion_label([r]) for r in run_batched("emotion", texts, batch_size)]
+    for d, r in zip(derived, reference):
+        record_emotion_agreement(d, r)
+    return agreement_summary()
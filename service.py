@@ -0,0 +1,230 @@
+# service.py
+"""Local HTTP assessment service: warm models, answers from many tablets at once.
+
+    python service.py --host 0.0.0.0 --port 8080
+
+    POST /answer   {"question": "...", "text": "..."}
+                   {"question": "...", "audio": "<base64 WAV/FLAC/OGG>"}
+                   or a raw audio body (Content-Type audio/*) with ?question=...
+    GET  /health   loaded models, batching and result cache statistics
+    GET  /metrics  stage timings in Prometheus text format
+
+/answer returns the dict speech.get_voice_input_for_question builds, or 422
+when the audio has no speech. Concurrent requests share one Whisper batch and
+one batch per text classifier: a batch waits at most --max-wait-ms after its
+first request, or until --max-batch requests are queued.
+"""
+import argparse
+import base64
+import binascii
+import io
+import json
+import logging
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cache
+import metrics
+import models
+from session import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.environ.get("SERVICE_MAX_BATCH", "16"))
+MAX_WAIT_MS = float(os.environ.get("SERVICE_MAX_WAIT_MS", "25"))
+MAX_BODY_MB = float(os.environ.get("SERVICE_MAX_BODY_MB", "20"))
+
+
+class BadRequest(Exception):
+    pass
+
+
+class AssessmentService:
+    """The batchers behind the HTTP handler; usable directly from Python too."""
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        import speech
+        from voice import transcribe_many
+
+        max_wait = max_wait_ms / 1000
+        # Silence is trimmed per request before batching, see answer_audio
+        self.asr = MicroBatcher(lambda audios: transcribe_many(audios, vad=False), max_batch, max_wait,
+                                name="asr-batcher")
+        self.text = MicroBatcher(speech.analyze_transcripts, max_batch, max_wait, name="text-batcher")
+
+    def warm_up(self):
+        import speech
+        from warmup import WarmUp
+
+        # Loaded and run once each, so the first request does not pay for lazy set-up either
+        warm = WarmUp(speech.session_models()).start()
+        warm.wait()
+        return warm
+
+    def answer_text(self, question, text):
+        return self.text.submit(question, text).result()
+
+    def answer_audio(self, question, samples):
+        from voice import trim_answer
+
+        samples, speech_ratio = trim_answer(samples)
+        text = self.asr.submit(samples).result() if len(samples) else ""
+        if not text:
+            return None
+        result = self.answer_text(question, text)
+        if result:
+            result["speech_ratio"] = speech_ratio
+        return result
+
+    def health(self):
+        return {
+            "status": "ok",
+            "models": models.loaded_models(),
+            "batching": {"asr": self.asr.stats(), "text": self.text.stats()},
+            "cache": cache.cache_stats(),
+        }
+
+    def shutdown(self):
+        self.asr.shutdown()
+        self.text.shutdown()
+
+
+def _decode_audio(data):
+    from audio import load_audio
+
+    try:
+        return load_audio(io.BytesIO(data))
+    except Exception as e:
+        raise BadRequest(f"could not decode audio: {e}")
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "AssessmentService/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(obj, ensure_ascii=False))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, self.service.health())
+        elif path == "/metrics":
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/answer":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_MB * 1024 * 1024:
+            self.close_connection = True
+            self._send_json(413, {"error": f"body larger than {MAX_BODY_MB:g} MB"})
+            return
+        body = self.rfile.read(length)
+
+        try:
+            result = self._answer(url, body)
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.exception("Analysis failed")
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        if result is None:
+            self._send_json(422, {"error": "could not transcribe audio"})
+        else:
+            self._send_json(200, result)
+
+    def _answer(self, url, body):
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        if content_type.startswith("audio/"):
+            question = parse_qs(url.query).get("question", [""])[0]
+            if not question:
+                raise BadRequest("audio uploads need a ?question= parameter")
+            return self.service.answer_audio(question, _decode_audio(body))
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise BadRequest("body is not valid JSON")
+        question = request.get("question") if isinstance(request, dict) else None
+        if not question:
+            raise BadRequest("missing 'question'")
+
+        if request.get("text") is not None:
+            if not isinstance(request["text"], str) or not request["text"].strip():
+                raise BadRequest("'text' must be a non-empty string")
+            return self.service.answer_text(question, request["text"].strip())
+        if request.get("audio"):
+            try:
+                data = base64.b64decode(request["audio"], validate=True)
+            except (binascii.Error, TypeError):
+                raise BadRequest("'audio' is not valid base64")
+            return self.service.answer_audio(question, _decode_audio(data))
+        raise BadRequest("send either 'text' or 'audio'")
+
+
+class AssessmentServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # a site's tablets may all connect at once
+
+    def __init__(self, address, service):
+        super().__init__(address, Handler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve answer analysis over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="largest batch per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="how long a batch waits for more requests after its first")
+    parser.add_argument("--no-warm-up", action="store_true", help="load models on first use instead of at start")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+    service = AssessmentService(args.max_batch, args.max_wait_ms)
+    if not args.no_warm_up:
+        print("⏳ Loading models...")
+        service.warm_up()
+
+    server = AssessmentServer((args.host, args.port), service)
+    print(f"✅ Listening on http://{args.host}:{args.port} (batches of up to {args.max_batch}, "
+          f"{args.max_wait_ms:g} ms wait)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# session.py
+"""How a question session schedules capture and analysis.
+
+    sequential - speak, record, analyse, then move on (default)
+    pipelined  - record answer N+1 while answer N is analysed in the background
+    deferred   - keep every answer in memory and analyse them all in one batch at the end
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SESSION_MODE = os.environ.get("SESSION_MODE", "sequential")
+
+# A run_session result whose analysis raised `error`
+FailedItem = namedtuple("FailedItem", ["item", "error"])
+
+
+class InlineExecutor:
+    """Executor stand-in that runs each task immediately on the calling thread."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class DeferredExecutor:
+    """Executor stand-in that holds every submitted task until shutdown().
+
+    On shutdown the collected arguments are passed column-wise to `batch_fn` in a
+    single call (submit(fn, a, b) x N -> batch_fn([a1..aN], [b1..bN])), which must
+    return one result per task; the submitted `fn` itself is not called.
+    """
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self._pending = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._pending.append((future, args))
+        return future
+
+    def shutdown(self, wait=True):
+        pending, self._pending = self._pending, []
+        if pending:
+            _run_batch(self.batch_fn, pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+
+def _run_batch(batch_fn, pending):
+    """Call batch_fn once with the pending tasks' arguments column-wise and resolve their futures."""
+    try:
+        results = batch_fn(*(list(column) for column in zip(*(args for _, args in pending))))
+    except Exception as e:
+        for future, _ in pending:
+            future.set_exception(e)
+        return
+    for (future, _), result in zip(pending, results):
+        future.set_result(result)
+
+
+class MicroBatcher:
+    """Merges submit(*args) calls from many threads into batched batch_fn calls.
+
+    A background thread takes the first waiting task, collects more for up to
+    `max_wait` seconds or until `max_batch` are queued, then runs them with one
+    column-wise batch_fn call, as DeferredExecutor does at shutdown.
+    """
+
+    def __init__(self, batch_fn, max_batch=16, max_wait=0.02, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = self.tasks = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, *args):
+        future = Future()
+        self._queue.put((future, args))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            task = self._queue.get()
+            if task is None:
+                return
+            pending = [task]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch:
+                try:
+                    task = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if task is None:
+                    stopping = True
+                    break
+                pending.append(task)
+            self.batches += 1
+            self.tasks += len(pending)
+            _run_batch(self.batch_fn, pending)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "tasks": self.tasks,
+            "mean_batch": round(self.tasks / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def shutdown(self, wait=True):
+        """Run whatever is already queued, then stop the batching thread."""
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+
+def analysis_executor(mode=None, batch_fn=None):
+    """Executor for answer analysis.
+
+    pipelined: a single background worker, enough to overlap inference with the
+    next recording while keeping results, prints and model use in question order.
+    deferred: a DeferredExecutor around `batch_fn`. Otherwise tasks run inline.
+    """
+    mode = mode or SESSION_MODE
+    if mode == "pipelined":
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+    if mode == "deferred" and batch_fn is not None:
+        return DeferredExecutor(batch_fn)
+    return InlineExecutor()
+
+
+def run_session(items, capture, analyze, mode=None, analyze_batch=None):
+    """Capture each item and analyse it; returns analyze(item, captured) results in item order.
+
+    In deferred mode analyze_batch(items, captured_list) replaces the per-item calls.
+    An item whose analysis raised comes back as FailedItem(item, error) and is
+    logged as soon as it fails, so one bad answer does not lose the others.
+    """
+    def log_failure(item):
+        def callback(future):
+            error = future.exception()
+            if error is not None:
+                logger.error("Analysis of %r failed: %s", item, error, exc_info=error)
+        return callback
+
+    submitted = []
+    with analysis_executor(mode, analyze_batch) as pool:
+        for item in items:
+            future = pool.submit(analyze, item, capture(item))
+            future.add_done_callback(log_failure(item))
+            submitted.append((item, future))
+    return [FailedItem(item, f.exception()) if f.exception() else f.result() for item, f in submitted]
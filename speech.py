@@ -1,12 +1,26 @@
 # speech.py
-import speech_recognition as sr
-from voice import analyze_emotion_from_audio
+from voice import (ASR_STREAMING, analyze_emotion_from_audio, classify_emotion, classify_emotions,
+                   transcribe_live, transcribe_many, trim_answer)
 import sentiment
 import moderation
+import baselines
+from session import FailedItem, run_session
+from config import WORKER_ID, WORKER_TEAM, check_names
+from metrics import stage
+import logging
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict, namedtuple
 import os
 
+# Where the coarse "emotion" field comes from:
+#   distilbert - separate DistilBERT emotion model (default)
+#   go_emotion - derived from the go-emotion scores, one forward pass fewer per answer
+#   validate   - derive it, but also run DistilBERT and track how often they agree
+EMOTION_SOURCE = os.environ.get("EMOTION_SOURCE", "distilbert")
+
+# REPORT_FILES=1 also writes the per-session report_*.txt files
+REPORT_FILES = os.environ.get("REPORT_FILES", "0") == "1"
+
 # ---------------- Updated Questions ---------------- #
 questions = [
     "How are you today?",
@@ -19,49 +33,193 @@ questions = [
 user_responses = []
 
 # -------------- Voice Input -------------- #
-def get_voice_input_for_question(question):
+def capture_answer(question):
+    import speech_recognition as sr
+
     recognizer = sr.Recognizer()
     with sr.Microphone() as source:
         print(f"\n📝 Question: {question}")
         print("🎤 Listening... Speak your answer.")
-        recognizer.adjust_for_ambient_noise(source)
-        audio = recognizer.listen(source)
-
-        transcribed_text, emotion = analyze_emotion_from_audio(audio)
-
-        if transcribed_text:
-            print("🗣️ You said:", transcribed_text)
-
-            sentiment_result = {}
-            moderation_result = {}
-
-            try:
-                sentiment_result = sentiment.analyze_sentiment(transcribed_text)
-            except Exception as e:
-                print(f"[❗ Sentiment Error] {e}")
-
-            try:
-                moderation_result = moderation.analyze_moderation(transcribed_text)
-            except Exception as e:
-                print(f"[❗ Moderation Error] {e}")
-
-            return {
-                "question": question,
-                "answer": transcribed_text,
-                "emotion": emotion,
-                "sentiment": sentiment_result,
-                "moderation": moderation_result
-            }
-        else:
-            print("❗Could not transcribe audio.")
-            return None
+        with stage("record"):
+            recognizer.adjust_for_ambient_noise(source)
+            return recognizer.listen(source)
+
+# An answer transcribed while it was given (ASR_STREAMING=1): its text, speech
+# ratio, and the analyses of its sentences, each run as soon as it was spoken
+LiveAnswer = namedtuple("LiveAnswer", ["text", "speech_ratio", "sentences"])
+
+def live_answers():
+    """True when answers are transcribed and analysed while they are given."""
+    import capture
+    return ASR_STREAMING and capture.CAPTURE_MODE == "streaming"
+
+def capture_answer_live(question):
+    print(f"\n📝 Question: {question}")
+    print("🎤 Listening... Speak your answer.")
+    analysed = []
+
+    def on_sentences(sentences):
+        analysed.extend(analyze_transcripts([question] * len(sentences), sentences))
+
+    text, speech_ratio = transcribe_live(on_sentences=on_sentences)
+    return LiveAnswer(text, speech_ratio, analysed)
+
+def combine_sentences(question, live):
+    """Result dict of a LiveAnswer from its sentences' analyses.
+
+    Sentiment is the word-weighted mean over sentences and moderation the
+    highest score per label, so one toxic sentence still flags the answer.
+    """
+    parts = [p for p in live.sentences if p]
+    if not live.text or not parts:
+        print("❗Could not transcribe audio.")
+        return None
+    print("🗣️ You said:", live.text)
+
+    weights = [len(p["answer"].split()) for p in parts]
+    total = sum(weights)
+    sentiment_result = defaultdict(float)
+    moderation_result = {}
+    for p, weight in zip(parts, weights):
+        for label, score in p["sentiment"].items():
+            sentiment_result[label] += score * weight / total
+        for label, score in p["moderation"].items():
+            moderation_result[label] = max(moderation_result.get(label, 0.0), score)
+    sentiment_result = {label: round(score, 2) for label, score in sentiment_result.items()}
+
+    statuses = {p["moderation_status"] for p in parts}
+    moderation_status = next((s for s in (moderation.STATUS_ERROR, moderation.STATUS_MODEL) if s in statuses),
+                             moderation.STATUS_SKIPPED)
+
+    if EMOTION_SOURCE == "distilbert":
+        votes = Counter()
+        for p, weight in zip(parts, weights):
+            votes[p["emotion"]] += weight
+        emotion = votes.most_common(1)[0][0]
+    else:
+        emotion = sentiment.derive_emotion(sentiment_result)
+
+    return {
+        "question": question,
+        "answer": live.text,
+        "emotion": emotion,
+        "sentiment": sentiment_result,
+        "moderation": moderation_result,
+        "moderation_status": moderation_status,
+        "speech_ratio": live.speech_ratio
+    }
+
+def analyze_answer(question, audio):
+    if isinstance(audio, LiveAnswer):
+        return combine_sentences(question, audio)
+    samples, speech_ratio = trim_answer(audio)
+    transcribed_text, emotion = analyze_emotion_from_audio(samples, classify=EMOTION_SOURCE == "distilbert", vad=False)
+
+    if transcribed_text:
+        print("🗣️ You said:", transcribed_text)
+
+        sentiment_result = {}
+        moderation_result = {}
+        moderation_status = moderation.STATUS_ERROR
+
+        try:
+            sentiment_result = sentiment.analyze_sentiment(transcribed_text)
+        except Exception as e:
+            print(f"[❗ Sentiment Error] {e}")
+
+        try:
+            (moderation_result,), (moderation_status,) = moderation.moderate([transcribed_text])
+        except Exception as e:
+            print(f"[❗ Moderation Error] {e}")
+
+        if EMOTION_SOURCE != "distilbert":
+            emotion = sentiment.derive_emotion(sentiment_result)
+            if EMOTION_SOURCE == "validate":
+                sentiment.record_emotion_agreement(emotion, classify_emotion(transcribed_text))
+
+        return {
+            "question": question,
+            "answer": transcribed_text,
+            "emotion": emotion,
+            "sentiment": sentiment_result,
+            "moderation": moderation_result,
+            "moderation_status": moderation_status,
+            "speech_ratio": speech_ratio
+        }
+    else:
+        print("❗Could not transcribe audio.")
+        return None
+
+def get_voice_input_for_question(question):
+    return analyze_answer(question, capture_answer(question))
+
+def analyze_answers(questions, audios):
+    """Batch version of analyze_answer: one Whisper batch, then one batch per text classifier."""
+    if any(isinstance(a, LiveAnswer) for a in audios):
+        return [analyze_answer(q, a) for q, a in zip(questions, audios)]  # analysed while recorded
+    buffers, speech_ratios = zip(*(trim_answer(a) for a in audios)) if audios else ((), ())
+    results = analyze_transcripts(questions, transcribe_many(list(buffers), vad=False))
+    for result, ratio in zip(results, speech_ratios):
+        if result:
+            result["speech_ratio"] = ratio
+    return results
+
+def session_models():
+    """Registry names of the models analysing an answer needs, in the order they are first used."""
+    names = ["whisper"]
+    if EMOTION_SOURCE != "go_emotion":
+        names.append("emotion")
+    return names + ["go_emotion", "toxic"]
+
+def analyze_transcripts(questions, texts):
+    """Result dicts for already transcribed answers, one batch per text classifier; None where a text is empty."""
+    answered = [i for i, text in enumerate(texts) if text]
+    answered_texts = [texts[i] for i in answered]
+
+    sentiment_results = [{}] * len(answered)
+    moderation_results = [{}] * len(answered)
+    moderation_statuses = [moderation.STATUS_ERROR] * len(answered)
+
+    try:
+        sentiment_results = sentiment.analyze_many(answered_texts)
+    except Exception as e:
+        print(f"[❗ Sentiment Error] {e}")
+
+    try:
+        moderation_results, moderation_statuses = moderation.moderate(answered_texts)
+    except Exception as e:
+        print(f"[❗ Moderation Error] {e}")
+
+    if EMOTION_SOURCE == "distilbert":
+        emotions = classify_emotions(answered_texts)
+    else:
+        emotions = [sentiment.derive_emotion(s) for s in sentiment_results]
+        if EMOTION_SOURCE == "validate":
+            for derived, reference in zip(emotions, classify_emotions(answered_texts)):
+                sentiment.record_emotion_agreement(derived, reference)
+
+    results = [None] * len(texts)
+    for n, i in enumerate(answered):
+        results[i] = {
+            "question": questions[i],
+            "answer": texts[i],
+            "emotion": emotions[n],
+            "sentiment": sentiment_results[n],
+            "moderation": moderation_results[n],
+            "moderation_status": moderation_statuses[n]
+        }
+    for i, text in enumerate(texts):
+        if not text:
+            print(f"❗Could not transcribe audio for: {questions[i]}")
+    return results
 
 # ------------- Report 1: Sentiment + Moderation ------------- #
-def generate_sentiment_report(responses, user_id="User001", sentiment_thresh=5.0, moderation_thresh=0.01):
-    print("--------------------------------------------")
+def build_sentiment_report(responses, user_id="User001", sentiment_thresh=5.0, moderation_thresh=0.01, when=None):
+    """Text of the sentiment + moderation report; `when` (a datetime) defaults to now."""
+    when = when or datetime.now()
     report_lines = []
     report_lines.append(f"📋 Voice Sentiment Report for {user_id}")
-    report_lines.append(f"🕒 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report_lines.append(f"🕒 Date: {when.strftime('%Y-%m-%d %H:%M:%S')}")
     report_lines.append("=" * 60)
 
     sentiment_aggregate = defaultdict(float)
@@ -71,6 +229,8 @@ def generate_sentiment_report(responses, user_id="User001", sentiment_thresh=5.0
         report_lines.append(f"\nQ{idx}: {entry['question']}")
         report_lines.append(f"🗣️ Answer: {entry['answer']}")
         report_lines.append(f"🎭 Emotion: {entry['emotion'] or 'N/A'}")
+        if entry.get('speech_ratio') is not None:
+            report_lines.append(f"🎙️ Speech: {entry['speech_ratio']:.0%} of the recording")
 
         sentiment_data = entry.get('sentiment') or {}
         moderation_data = entry.get('moderation') or {}
@@ -136,22 +296,25 @@ def generate_sentiment_report(responses, user_id="User001", sentiment_thresh=5.0
     )
     report_lines.append("\n✅ Summary: No major red flags." if all_clear else "\n⚠️ Alert: Some moderation risks detected.")
 
-    final_report = "\n".join(report_lines)
+    return "\n".join(report_lines)
+
+def generate_sentiment_report(responses, user_id="User001", sentiment_thresh=5.0, moderation_thresh=0.01):
+    print("--------------------------------------------")
+    final_report = build_sentiment_report(responses, user_id, sentiment_thresh, moderation_thresh)
     filename = f"report_sentiment_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
 
-    with open(filename, "w", encoding="utf-8") as f:
+    with stage("report_write"), open(filename, "w", encoding="utf-8") as f:
         f.write(final_report)
 
     print("--------------------------------------------")
     print(f"\n📁 Sentiment report saved as: {filename}")
+    return filename
 
 # ------------- Report 2: Readiness Score ------------- #
 import statistics
 
-def generate_readiness_score_report(responses, user_id="User001"):
-    POSITIVE_EMOTIONS = {"joy", "gratitude", "admiration", "optimism", "love", "hope", "approval", "relief", "pride"}
-    NEGATIVE_EMOTIONS = {"anger", "sadness", "disgust", "fear", "grief", "disappointment", "disapproval", "annoyance", "remorse", "nervousness"}
-
+def answer_scores(responses):
+    """Positive and negative score of each answer: the sum of its top three non-neutral labels in each set."""
     pos_raw = []
     neg_raw = []
 
@@ -162,39 +325,61 @@ def generate_readiness_score_report(responses, user_id="User001"):
         non_neutral = [(k, v) for k, v in sentiment_data.items() if k.lower() != 'neutral']
         top_3 = sorted(non_neutral, key=lambda x: x[1], reverse=True)[:3]
 
-        pos_score = sum(score for label, score in top_3 if label in POSITIVE_EMOTIONS)
-        neg_score = sum(score for label, score in top_3 if label in NEGATIVE_EMOTIONS)
+        pos_score = sum(score for label, score in top_3 if label in sentiment.POSITIVE_EMOTIONS)
+        neg_score = sum(score for label, score in top_3 if label in sentiment.NEGATIVE_EMOTIONS)
 
         pos_raw.append(pos_score)
         neg_raw.append(neg_score)
+    return pos_raw, neg_raw
+
+def compute_readiness(responses, baseline=None):
+    """(readiness 0-100, positive z-scores, negative z-scores) for one session's answers.
+
+    With a usable `baseline` (see baselines.py) answers are z-scored against the
+    worker's own history; otherwise against the other answers in this session.
+    """
+    pos_raw, neg_raw = answer_scores(responses)
 
     # Safe std deviation
     def safe_std(values):
-        return statistics.stdev(values) if len(values) > 1 else 1.0
+        return (statistics.stdev(values) if len(values) > 1 else 1.0) or 1.0
 
     # Z-score calculation
-    def z_scores(values):
-        mean = statistics.mean(values)
-        std = safe_std(values)
+    def z_scores(values, history=None):
+        if not values:
+            return []
+        if history is not None:
+            mean, std = history.mean, history.std or 1.0
+        else:
+            mean, std = statistics.mean(values), safe_std(values)
         return [(x - mean) / std for x in values]
 
-    pos_z = z_scores(pos_raw)
-    neg_z = z_scores(neg_raw)
+    use_baseline = baselines.usable(baseline)
+    pos_z = z_scores(pos_raw, baseline.pos if use_baseline else None)
+    neg_z = z_scores(neg_raw, baseline.neg if use_baseline else None)
 
     avg_pos_z = sum(z for z in pos_z if z > 0) / len(pos_z) if pos_z else 0
     avg_neg_z = sum(z for z in neg_z if z < 0) / len(neg_z) if neg_z else 0
 
     readiness = 50 + (avg_pos_z * 10) + (avg_neg_z * 10)
     readiness = round(max(0, min(readiness, 100)), 2)
+    return readiness, pos_z, neg_z
+
+def build_readiness_report(responses, user_id="User001", baseline=None, when=None):
+    """Text of the readiness score report; `when` (a datetime) defaults to now."""
+    when = when or datetime.now()
+    readiness, pos_z, neg_z = compute_readiness(responses, baseline)
+    basis = f"{baseline.pos.n} past answers from this worker" if baselines.usable(baseline) else "this session only"
 
     # Generate report
     report = [
         f"🧠 Mental & Emotional Readiness Score Report",
         f"👷 Worker ID: {user_id}",
-        f"🕒 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"🕒 Date: {when.strftime('%Y-%m-%d %H:%M:%S')}",
         "=" * 60,
         f"\n📊 Positive Z-Scores: {['{:.2f}'.format(z) for z in pos_z]}",
         f"📉 Negative Z-Scores: {['{:.2f}'.format(z) for z in neg_z]}",
+        f"📐 Baseline: {basis}",
         f"\n✅ Final Readiness Score: {readiness:.2f} / 100"
     ]
 
@@ -205,19 +390,68 @@ def generate_readiness_score_report(responses, user_id="User001"):
     else:
         report.append("🔴 Status: Worker may not be mentally/emotionally ready.")
 
+    return "\n".join(report)
+
+def generate_readiness_score_report(responses, user_id="User001", baseline=None):
+    report = build_readiness_report(responses, user_id, baseline)
     filename = f"report_readiness_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n".join(report))
+    with stage("report_write"), open(filename, "w", encoding="utf-8") as f:
+        f.write(report)
 
     print(f"\n📁 Readiness score report saved as: {filename}")
+    return filename
 
 # --------------- Main ---------------- #
 if __name__ == "__main__":
-    for question in questions:
-        result = get_voice_input_for_question(question)
-        if result:
+    from store import STORE_DIR, session_store
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
+    # A name the store cannot hold would only fail once the whole session had been run
+    try:
+        check_names()
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    import warmup
+    warmup.start(session_models())  # overlaps loading with the first question
+
+    # SESSION_MODE=pipelined records the next answer while this one is analysed;
+    # SESSION_MODE=deferred analyses all answers in one batch after the last question
+    # ASR_STREAMING=1 transcribes and analyses each answer while it is being given
+    capture_step = capture_answer_live if live_answers() else capture_answer
+    for result in run_session(questions, capture_step, analyze_answer, analyze_batch=analyze_answers):
+        if isinstance(result, FailedItem):
+            print(f"❌ Could not analyse the answer to \"{result.item}\": {result.error}")
+        elif result:
             user_responses.append(result)
 
     if user_responses:
-        generate_sentiment_report(user_responses)
-        generate_readiness_score_report(user_responses)
+        baseline_store = baselines.store()
+        baseline = baseline_store.get(WORKER_ID) if baseline_store else None
+
+        # Sessions go to the columnar store; reports are rendered from it on demand
+        if REPORT_FILES:
+            generate_sentiment_report(user_responses, user_id=WORKER_ID)
+            generate_readiness_score_report(user_responses, user_id=WORKER_ID, baseline=baseline)
+        else:
+            print(build_readiness_report(user_responses, user_id=WORKER_ID, baseline=baseline))
+
+        with stage("report_write"):
+            readiness = compute_readiness(user_responses, baseline)[0]
+            index = session_store().append(user_responses, WORKER_ID, team=WORKER_TEAM,
+                                           readiness=readiness, baseline=baseline)
+        print(f"\n📁 Session #{index} saved to {STORE_DIR} (python store.py report {index})")
+
+        # Score against past answers first, then add this session to the worker's history
+        if baseline_store:
+            baseline_store.update(WORKER_ID, *answer_scores(user_responses))
+
+    if EMOTION_SOURCE == "validate":
+        agreed, total, rate = sentiment.agreement_summary()
+        print(f"\n🔁 Derived emotion matched DistilBERT on {agreed}/{total} answers ({rate:.0%})")
+
+    if moderation.MODERATION_PREFILTER != "off":
+        p = moderation.prefilter_summary()
+        print(f"\n🧹 Moderation prefilter skipped {p['skipped']}/{p['screened']} answers ({p['skip_rate']:.0%})")
+        if moderation.MODERATION_PREFILTER == "shadow":
+            print(f"   missed {p['false_negatives']}/{p['flagged']} answers toxic-bert flagged "
+                  f"({p['false_negative_rate']:.0%} false negatives)")
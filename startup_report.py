@@ -0,0 +1,90 @@
+# startup_report.py
+"""Measure the cold import cost of each assessment module.
+
+Every module is imported in a fresh interpreter with `python -X importtime`,
+so results are not skewed by modules already loaded by an earlier one.
+
+    python startup_report.py              # table for all modules
+    python startup_report.py speech --top 10
+    python startup_report.py --json >> startup_times.jsonl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+MODULES = ["models", "sentiment", "moderation", "voice", "speech", "report",
+           "Risk_score", "Transcrib", "VoiceText"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module):
+    """Return (total_ms, [(cumulative_ms, dependency), ...]) for one cold import.
+
+    Dependencies are the modules imported directly by `module`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else "import failed")
+
+    # Lines look like "import time:  self_us | cumulative_us | <indent>name";
+    # children are printed before their parent, indented two more spaces.
+    children = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        name = raw_name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        name = name.strip()
+        cumulative_ms = int(cumulative_us) / 1000
+        if depth == 0:
+            if name == module:
+                return cumulative_ms, children
+            children = []
+        elif depth == 1:
+            children.append((cumulative_ms, name))
+    return 0.0, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cold import time per module.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--top", type=int, default=3, help="slowest dependencies to list per module")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per module")
+    args = parser.parse_args()
+
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    for module in args.modules:
+        try:
+            total_ms, entries = measure_import(module)
+        except RuntimeError as e:
+            if args.json:
+                print(json.dumps({"time": timestamp, "module": module, "error": str(e)}))
+            else:
+                print(f"❌ {module:<12} {e}")
+            continue
+
+        deps = sorted(entries, reverse=True)[:args.top]
+
+        if args.json:
+            print(json.dumps({
+                "time": timestamp,
+                "module": module,
+                "import_ms": round(total_ms, 1),
+                "slowest": [{"module": name, "ms": round(ms, 1)} for ms, name in deps],
+            }))
+        else:
+            slowest = ", ".join(f"{name} {ms:.0f}ms" for ms, name in deps)
+            print(f"⏱️ {module:<12} {total_ms:8.1f} ms   {slowest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# store.py
+"""Append-only columnar store of analysed sessions, replacing per-session report files.
+
+    session_store/
+        sessions.bin     one SESSION_DTYPE record per session: worker, team, time,
+                         readiness and the baseline it was scored against
+        answers.bin      one ANSWER_DTYPE record per answer: float32 scores for all
+                         28 go-emotion and 6 toxic-bert labels, emotion, question and
+                         moderation status (so a prefilter skip is not read as clean)
+        transcripts.bin  UTF-8 answer texts, addressed by offset and length
+        questions.txt    question texts, one per line, referenced by line number
+
+Files are only ever appended to and are read through np.memmap, so queries
+touch the columns they need instead of parsing text. A session's record is
+written after its answers and transcripts, so an interrupted append never
+leaves a half-visible session. Human-readable reports are rendered on demand.
+
+    python store.py list --worker User001 --since 2025-08-01
+    python store.py report 41                    # both reports for session 41
+    python store.py report 41 --kind readiness -o report.txt
+"""
+import argparse
+import contextlib
+import os
+import sys
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+from config import NAME_BYTES, encode_name
+from moderation import STATUSES as MODERATION_STATUSES, TOXIC_LABELS
+from sentiment import GO_EMOTION_LABELS, GO_EMOTION_TO_EMOTION
+
+STORE_DIR = os.environ.get("STORE_DIR", "session_store")
+
+# Coarse emotion labels, stored as an index (-1 for none)
+EMOTIONS = list(GO_EMOTION_TO_EMOTION) + ["neutral"]
+
+SESSION_DTYPE = np.dtype([
+    ("worker", f"S{NAME_BYTES}"),
+    ("team", f"S{NAME_BYTES}"),
+    ("time", "f8"),              # unix seconds
+    ("day", "i4"),               # days since 1970-01-01, for date queries
+    ("first_answer", "i8"),      # row of the session's first answer in answers.bin
+    ("n_answers", "i2"),
+    ("readiness", "f4"),
+    ("baseline_n", "i4"),        # 0: scored within the session
+    ("baseline", "f8", (4,)),    # pos mean, pos m2, neg mean, neg m2
+])
+
+ANSWER_DTYPE = np.dtype([
+    ("session", "i8"),
+    ("question", "i4"),
+    ("emotion", "i1"),
+    ("moderation_status", "i1"),  # index into moderation.STATUSES, -1 unknown
+    ("sentiment", "f4", (len(GO_EMOTION_LABELS),)),  # percent, as sentiment.analyze_sentiment
+    ("moderation", "f4", (len(TOXIC_LABELS),)),     # probabilities, as moderation.analyze_moderation
+    ("text_offset", "i8"),
+    ("text_length", "i4"),
+])
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Exclusive lock for appends from several processes (a no-op where fcntl is missing)."""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SessionStore:
+    def __init__(self, path=None):
+        self.path = path or STORE_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._questions = []
+        self._question_ids = {}
+        self._worker_index = (0, None, None)  # (sessions indexed, order, sorted workers)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_questions(self):
+        path = self._file("questions.txt")
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().split("\n")[:-1]
+        for text in lines[len(self._questions):]:
+            self._question_ids[text] = len(self._questions)
+            self._questions.append(text)
+
+    def _count(self, name, dtype):
+        path = self._file(name)
+        # Whole records only: a torn final record from an interrupted append is ignored
+        return os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+
+    def _map(self, name, dtype, count):
+        if not count:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=(count,))
+
+    def sessions(self):
+        """Read-only memmap of every complete session record."""
+        return self._map("sessions.bin", SESSION_DTYPE, self._count("sessions.bin", SESSION_DTYPE))
+
+    def answers(self):
+        """Read-only memmap of every answer record."""
+        return self._map("answers.bin", ANSWER_DTYPE, self._count("answers.bin", ANSWER_DTYPE))
+
+    @property
+    def questions(self):
+        self._load_questions()
+        return list(self._questions)
+
+    def __len__(self):
+        return self._count("sessions.bin", SESSION_DTYPE)
+
+    def append(self, responses, worker, team=None, when=None, readiness=None, baseline=None):
+        """Store one analysed session and return its index."""
+        import baselines
+
+        responses = [r for r in responses if r]
+        when = when or datetime.now()
+        worker_key, team_key = encode_name(worker, "worker"), encode_name(team, "team")
+        with self._lock, _file_lock(self._file(".lock")):
+            self._load_questions()
+            new_questions = [r["question"] for r in responses if r["question"] not in self._question_ids]
+            if new_questions:
+                with open(self._file("questions.txt"), "a", encoding="utf-8") as f:
+                    for text in dict.fromkeys(new_questions):
+                        f.write(text.replace("\n", " ") + "\n")
+                self._load_questions()
+
+            index = self._count("sessions.bin", SESSION_DTYPE)
+            first_answer = self._count("answers.bin", ANSWER_DTYPE)
+            # Drop any torn tail left by an interrupted append before adding rows
+            for name, count, dtype in (("answers.bin", first_answer, ANSWER_DTYPE),
+                                       ("sessions.bin", index, SESSION_DTYPE)):
+                if os.path.exists(self._file(name)) and os.path.getsize(self._file(name)) != count * dtype.itemsize:
+                    os.truncate(self._file(name), count * dtype.itemsize)
+
+            texts = [(r["answer"] or "").encode("utf-8") for r in responses]
+            with open(self._file("transcripts.bin"), "ab") as f:
+                offset = f.tell()
+                f.write(b"".join(texts))
+
+            rows = np.zeros(len(responses), dtype=ANSWER_DTYPE)
+            rows["session"] = index
+            for i, (r, text) in enumerate(zip(responses, texts)):
+                sentiment, moderation = r.get("sentiment") or {}, r.get("moderation") or {}
+                rows[i]["question"] = self._question_ids[r["question"]]
+                rows[i]["emotion"] = EMOTIONS.index(r["emotion"]) if r.get("emotion") in EMOTIONS else -1
+                status = r.get("moderation_status")
+                rows[i]["moderation_status"] = (MODERATION_STATUSES.index(status)
+                                                if status in MODERATION_STATUSES else -1)
+                rows[i]["sentiment"] = [sentiment.get(label, 0.0) for label in GO_EMOTION_LABELS]
+                rows[i]["moderation"] = [moderation.get(label, 0.0) for label in TOXIC_LABELS]
+                rows[i]["text_offset"] = offset
+                rows[i]["text_length"] = len(text)
+                offset += len(text)
+            with open(self._file("answers.bin"), "ab") as f:
+                f.write(rows.tobytes())
+
+            record = np.zeros(1, dtype=SESSION_DTYPE)
+            record["worker"], record["team"] = worker_key, team_key
+            record["time"] = when.timestamp()
+            record["day"] = (np.datetime64(when.date(), "D") - np.datetime64(0, "D")).astype(int)
+            record["first_answer"], record["n_answers"] = first_answer, len(responses)
+            record["readiness"] = np.nan if readiness is None else readiness
+            if baselines.usable(baseline):
+                record["baseline_n"] = baseline.pos.n
+                record["baseline"] = [baseline.pos.mean, baseline.pos.m2, baseline.neg.mean, baseline.neg.m2]
+            # Written last: the session becomes visible only once its answers are on disk
+            with open(self._file("sessions.bin"), "ab") as f:
+                f.write(record.tobytes())
+        return index
+
+    def _by_worker(self, sessions, worker):
+        n, order, sorted_workers = self._worker_index
+        if n != len(sessions):
+            order = np.argsort(sessions["worker"], kind="stable")
+            sorted_workers = sessions["worker"][order]
+            self._worker_index = (len(sessions), order, sorted_workers)
+        key = encode_name(worker, "worker")
+        lo, hi = np.searchsorted(sorted_workers, key, "left"), np.searchsorted(sorted_workers, key, "right")
+        return np.sort(order[lo:hi])
+
+    def query(self, worker=None, since=None, until=None, team=None):
+        """Indices of sessions matching every given filter, oldest first."""
+        sessions = self.sessions()
+        indices = self._by_worker(sessions, worker) if worker else np.arange(len(sessions))
+        days = sessions["day"][indices]
+        mask = np.ones(len(indices), dtype=bool)
+        if since:
+            mask &= days >= (np.datetime64(since, "D") - np.datetime64(0, "D")).astype(int)
+        if until:
+            mask &= days <= (np.datetime64(until, "D") - np.datetime64(0, "D")).astype(int)
+        if team:
+            mask &= sessions["team"][indices] == encode_name(team, "team")
+        return indices[mask]
+
+    def transcripts(self, rows):
+        """Answer texts for a slice or array of answer records."""
+        with open(self._file("transcripts.bin"), "rb") as f:
+            data = f.read() if len(rows) > 64 else None
+            texts = []
+            for offset, length in zip(rows["text_offset"], rows["text_length"]):
+                if data is None:
+                    f.seek(offset)
+                    texts.append(f.read(length).decode("utf-8"))
+                else:
+                    texts.append(data[offset:offset + length].decode("utf-8"))
+        return texts
+
+    def session(self, index):
+        """(metadata dict, responses) for one stored session, in the shape speech.py produces."""
+        record = self.sessions()[index]
+        first, count = int(record["first_answer"]), int(record["n_answers"])
+        rows = self.answers()[first:first + count]
+        questions = self.questions
+        responses = [{
+            "question": questions[row["question"]],
+            "answer": text,
+            "emotion": EMOTIONS[row["emotion"]] if row["emotion"] >= 0 else None,
+            "sentiment": {label: round(float(v), 2) for label, v in zip(GO_EMOTION_LABELS, row["sentiment"])},
+            "moderation": {label: round(float(v), 4) for label, v in zip(TOXIC_LABELS, row["moderation"])},
+            "moderation_status": (MODERATION_STATUSES[row["moderation_status"]]
+                                  if row["moderation_status"] >= 0 else None),
+        } for row, text in zip(rows, self.transcripts(rows))]
+        meta = {
+            "index": int(index),
+            "worker": record["worker"].decode("utf-8"),
+            "team": record["team"].decode("utf-8") or None,
+            "time": datetime.fromtimestamp(float(record["time"])),
+            "readiness": None if np.isnan(record["readiness"]) else round(float(record["readiness"]), 2),
+        }
+        return meta, responses
+
+    def baseline(self, index):
+        """The worker baseline session `index` was scored against, or None."""
+        from baselines import Baseline, RunningStats
+
+        record = self.sessions()[index]
+        n = int(record["baseline_n"])
+        if not n:
+            return None
+        pos_mean, pos_m2, neg_mean, neg_m2 = (float(v) for v in record["baseline"])
+        return Baseline(RunningStats(n, pos_mean, pos_m2), RunningStats(n, neg_mean, neg_m2))
+
+    def render(self, index, kind="sentiment"):
+        """A stored session as the text report speech.py used to write ("sentiment" or "readiness")."""
+        from speech import build_readiness_report, build_sentiment_report
+
+        meta, responses = self.session(index)
+        if kind == "readiness":
+            return build_readiness_report(responses, meta["worker"], self.baseline(index), when=meta["time"])
+        return build_sentiment_report(responses, meta["worker"], when=meta["time"])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def session_store():
+    """The process-wide store at STORE_DIR, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(STORE_DIR)
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query stored sessions and render their reports.")
+    parser.add_argument("--store", default=STORE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_cmd = commands.add_parser("list", help="list sessions, oldest first")
+    list_cmd.add_argument("--worker")
+    list_cmd.add_argument("--team")
+    list_cmd.add_argument("--since", type=date.fromisoformat)
+    list_cmd.add_argument("--until", type=date.fromisoformat)
+    report_cmd = commands.add_parser("report", help="render a stored session's reports")
+    report_cmd.add_argument("index", type=int)
+    report_cmd.add_argument("--kind", choices=["sentiment", "readiness", "both"], default="both")
+    report_cmd.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args()
+
+    store = SessionStore(args.store)
+    if args.command == "list":
+        sessions = store.sessions()
+        for i in store.query(args.worker, args.since, args.until, args.team):
+            s = sessions[i]
+            when = datetime.fromtimestamp(float(s["time"])).strftime("%Y-%m-%d %H:%M")
+            readiness = "-" if np.isnan(s["readiness"]) else f"{s['readiness']:.1f}"
+            print(f"{i:>8}  {when}  {s['worker'].decode('utf-8'):<16} {s['team'].decode('utf-8') or '-':<12} "
+                  f"{s['n_answers']:>2} answers  readiness {readiness}")
+        return 0
+
+    if not 0 <= args.index < len(store):
+        parser.error(f"no session {args.index} in {args.store} ({len(store)} stored)")
+    kinds = ["sentiment", "readiness"] if args.kind == "both" else [args.kind]
+    text = "\n\n".join(store.render(args.index, kind) for kind in kinds)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"📁 Report saved as: {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import pytest
+
+from routing import LIKERT, YES_NO, scale_answer
+
+
+@pytest.mark.parametrize("text, kind, expected", [
+    ("Strongly agree.", LIKERT, 5),
+    ("Yes, strongly agree.", LIKERT, 5),
+    ("Agree completely.", LIKERT, 5),
+    ("Absolutely.", LIKERT, 5),
+    ("Very much so.", LIKERT, 5),
+    ("I don't agree.", LIKERT, 2),
+    ("I don't really agree.", LIKERT, 2),
+    ("Not at all, I disagree.", LIKERT, 1),
+    ("Absolutely disagree.", LIKERT, 1),
+    ("Definitely disagree", LIKERT, 1),
+    ("Absolutely not.", LIKERT, 1),
+    ("I'm not sure.", LIKERT, 3),
+    ("Four.", LIKERT, 4),
+    ("I'd say four out of five.", LIKERT, 4),
+    ("I would say no one bothers me", LIKERT, None),
+    ("See you tomorrow.", LIKERT, None),
+    ("Yes, I have.", YES_NO, 5),
+    ("Absolutely.", YES_NO, 5),
+    ("No, I haven't.", YES_NO, 1),
+    ("Absolutely not.", YES_NO, 1),
+    ("Of course not.", YES_NO, 1),
+    ("Definitely not.", YES_NO, 1),
+    ("No, I have never had one.", YES_NO, 1),
+    ("I'm not sure.", YES_NO, None),
+    ("Yes... no, actually.", YES_NO, None),
+    ("No one.", YES_NO, None),
+])
+def test_scale_answer(text, kind, expected):
+    assert scale_answer(text, kind) == expected
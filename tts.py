@@ -0,0 +1,164 @@
+# tts.py
+"""Spoken prompts, synthesised once per text and played from in-memory PCM.
+
+Rendered prompts are cached on disk as 16-bit WAV under TTS_CACHE_DIR, keyed by
+a hash of the backend, language and text, so a fixed question set only ever
+hits the synthesis backend the first time. Pick the backend with TTS_BACKEND
+("gtts" online, "pyttsx3" offline) or add one with register_backend().
+
+    python tts.py      # pre-render every VoiceText/Transcrib prompt
+"""
+import hashlib
+import io
+import os
+import tempfile
+import time
+import wave
+
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "gtts")
+TTS_LANG = "en"
+CACHE_DIR = os.environ.get(
+    "TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tts_cache")
+)
+MIXER_RATE = 22050  # playback format: mono int16 at this rate
+
+
+def _gtts_synthesize(text, lang):
+    try:
+        from gtts import gTTS
+    except ImportError as e:
+        raise ImportError("TTS_BACKEND=gtts needs the gTTS package: pip install gTTS") from e
+
+    buf = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buf)
+    return buf.getvalue()  # mp3 bytes
+
+
+def _pyttsx3_synthesize(text, lang):
+    try:
+        import pyttsx3
+    except ImportError as e:
+        raise ImportError("TTS_BACKEND=pyttsx3 needs the pyttsx3 package: pip install pyttsx3") from e
+
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        engine = pyttsx3.init()
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+# name -> synthesize(text, lang) returning encoded audio bytes in any format pygame can load
+BACKENDS = {
+    "gtts": _gtts_synthesize,
+    "pyttsx3": _pyttsx3_synthesize,
+}
+
+_memory = {}  # cache key -> int16 PCM array at MIXER_RATE
+
+
+def register_backend(name, synthesize):
+    BACKENDS[name] = synthesize
+
+
+def _init_mixer():
+    try:
+        import pygame
+    except ImportError as e:
+        raise ImportError("Prompt playback needs the pygame package: pip install pygame") from e
+
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=MIXER_RATE, size=-16, channels=1)
+    return pygame
+
+
+def cache_key(text, backend=None):
+    backend = backend or TTS_BACKEND
+    return hashlib.sha256(f"{backend}\0{TTS_LANG}\0{MIXER_RATE}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.wav")
+
+
+def _decode(encoded):
+    """Encoded audio bytes (mp3, wav, ...) to a mono int16 array at MIXER_RATE."""
+    pygame = _init_mixer()
+    sound = pygame.mixer.Sound(file=io.BytesIO(encoded))
+    return pygame.sndarray.array(sound).copy()
+
+
+def _load_wav(path):
+    import numpy as np
+
+    with wave.open(path, "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def _save_wav(pcm, path):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write to a temp file and rename so concurrent sessions never read half a file
+    fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=CACHE_DIR)
+    os.close(fd)
+    with wave.open(tmp_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(MIXER_RATE)
+        wf.writeframes(pcm.tobytes())
+    os.replace(tmp_path, path)
+
+
+def get_pcm(text, backend=None, cache=True):
+    """PCM for `text`: from memory, then the disk cache, then the synthesis backend."""
+    backend = backend or TTS_BACKEND
+    key = cache_key(text, backend)
+    if key in _memory:
+        return _memory[key]
+
+    path = _cache_path(key)
+    if cache and os.path.exists(path):
+        pcm = _load_wav(path)
+    else:
+        pcm = _decode(BACKENDS[backend](text, TTS_LANG))
+        if cache:
+            _save_wav(pcm, path)
+
+    if cache:
+        _memory[key] = pcm
+    return pcm
+
+
+def prerender(texts, backend=None):
+    """Make sure every prompt in `texts` is cached and loaded; returns how many had to be synthesised."""
+    backend = backend or TTS_BACKEND
+    synthesized = 0
+    for text in texts:
+        if cache_key(text, backend) not in _memory and not os.path.exists(_cache_path(cache_key(text, backend))):
+            synthesized += 1
+        get_pcm(text, backend)
+    return synthesized
+
+
+def speak(text, backend=None, cache=True):
+    """Play `text` and block until it finishes. Use cache=False for one-off prompts."""
+    from metrics import stage
+
+    with stage("tts"):
+        pcm = get_pcm(text, backend, cache)
+        pygame = _init_mixer()
+        channel = pygame.sndarray.make_sound(pcm).play()
+        while channel is not None and channel.get_busy():
+            time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    from Transcrib import PROMPTS as TRANSCRIB_PROMPTS
+    from VoiceText import VOICE_PROMPTS
+
+    prompts = VOICE_PROMPTS + TRANSCRIB_PROMPTS
+    new = prerender(prompts)
+    print(f"🔊 {len(prompts)} prompts cached in {CACHE_DIR} ({new} newly synthesised)")
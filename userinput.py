@@ -18,7 +18,7 @@ for i, question in enumerate(questions, start=1):
         # Analyze emotion
         emotion = analyze_emotion_from_audio(answer_text)  # Update to return emotion if needed
         sentiment = sentiment.analyze_sentiment(answer_text)
-        moderation_result = moderation.analyze_moderation(answer_text)
+        moderation_result, moderation_status = moderation.analyze_moderation(answer_text, with_status=True)
 
         # Store the full record
         user_responses.append({
@@ -26,5 +26,6 @@ for i, question in enumerate(questions, start=1):
             "answer": answer_text,
             "emotion": emotion,
             "sentiment": sentiment,
-            "moderation": moderation_result
+            "moderation": moderation_result,
+            "moderation_status": moderation_status
         })
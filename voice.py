@@ -1,8 +1,23 @@
 # voice.py
+import logging
 import os
-import torch
-import soundfile as sf
-from transformers import pipeline
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Streaming ASR: answers longer than one chunk are transcribed as overlapping
+# chunks, stitched on the words the overlaps share
+ASR_STREAMING = os.environ.get("ASR_STREAMING", "0") == "1"
+ASR_CHUNK_S = float(os.environ.get("ASR_CHUNK_S", "8"))
+ASR_CHUNK_OVERLAP_S = float(os.environ.get("ASR_CHUNK_OVERLAP_S", "2"))
+STITCH_WORDS = 12  # how far back into the transcript an overlap is searched for
+
+# One step of transcribe_stream: the transcript so far, the words it gained, and
+# whether the answer is complete
+Partial = namedtuple("Partial", ["text", "new", "final"])
 
 # classifier = pipeline("text-classification", model="bhadresh-savani/distilbert-base-uncased-emotion")
 
@@ -25,36 +40,268 @@ from transformers import pipeline
 
 #     os.remove(file_path)
 #     return text
-def analyze_emotion_from_audio(audio_data):
-    import os
-    from transformers import pipeline
+def trim_answer(audio_data):
+    """(16 kHz buffer with surrounding silence trimmed, speech ratio) for a recorded answer.
+
+    The buffer is empty when the recording holds no speech. With VAD=0 the
+    audio is returned whole and the ratio is None.
+    """
+    from audio import VAD_ENABLED, from_audio_data, trim_silence
+
+    samples = from_audio_data(audio_data) if hasattr(audio_data, "get_raw_data") else audio_data
+    if not VAD_ENABLED:
+        return samples, None
+    with stage("vad"):
+        trimmed, ratio = trim_silence(samples)
+    logger.debug("VAD kept %d of %d samples (speech ratio %.2f)", len(trimmed), len(samples), ratio)
+    if len(samples) and not len(trimmed):
+        from audio import SAMPLE_RATE, frame_energy_db
+
+        energy = frame_energy_db(samples)
+        logger.warning("No speech found in a %.1fs answer (peak %.1f dBFS, speech ratio %.2f); it is not transcribed",
+                       len(samples) / SAMPLE_RATE, energy.max() if len(energy) else float("-inf"), ratio)
+    return trimmed, ratio
 
-    classifier = pipeline("text-classification", model="bhadresh-savani/distilbert-base-uncased-emotion", top_k=1)
-    speech_pipeline = pipeline("automatic-speech-recognition", model="openai/whisper-base", generate_kwargs={"language": "en"})
+def transcribe_audio(audio_data, vad=True):
+    """Transcribe a speech_recognition.AudioData or a 16 kHz float32 buffer, entirely in memory.
 
-    file_path = "temp.wav"
-    with open(file_path, "wb") as f:
-        f.write(audio_data.get_wav_data())
+    Silence is trimmed first (vad=False if the caller already did); a recording
+    without speech gives "" without running Whisper. With ASR_STREAMING=1 answers
+    longer than ASR_CHUNK_S go through transcribe_chunked.
+    """
+    from audio import SAMPLE_RATE, asr_input, from_audio_data
+    from models import get_pipeline
 
-    result = speech_pipeline(file_path)
+    if vad:
+        samples, _ = trim_answer(audio_data)
+    else:
+        samples = from_audio_data(audio_data) if hasattr(audio_data, "get_raw_data") else audio_data
+    if not len(samples):
+        return ""
+    if ASR_STREAMING and len(samples) > ASR_CHUNK_S * SAMPLE_RATE:
+        return transcribe_chunked(samples)
+
+    speech_pipeline = get_pipeline("whisper")
+    with stage("asr"):
+        result = speech_pipeline(asr_input(samples))
     text = result['text'].strip()
-    print(f"Transcribed text: {text}")
+    logger.debug("Transcribed text: %s", text)
 
-    top_emotion = "neutral"  # default fallback
-    if text:
-        emotion_result = classifier(text)
-        print(f"[DEBUG] Raw emotion_result: {emotion_result}")
+    return text
+
+def _normalise_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch(previous, new, window=STITCH_WORDS):
+    """Join two overlapping chunk transcripts, keeping the overlap once.
+
+    The longest run of words shared by the end of `previous` and the start of
+    `new` is where they meet; the newer chunk's wording is kept from there on,
+    since it heard those words with more context. Without a convincing match
+    the texts are simply joined.
+    """
+    prev_words, new_words = previous.split(), new.split()
+    if not prev_words or not new_words:
+        return " ".join(prev_words or new_words)
+    tail_start = max(0, len(prev_words) - window)
+    tail = [_normalise_word(w) for w in prev_words[tail_start:]]
+    head = [_normalise_word(w) for w in new_words[:window]]
+    match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+    if match.size >= 2 or match.size == 1 and len(tail[match.a]) > 3:
+        return " ".join(prev_words[:tail_start + match.a] + new_words[match.b:])
+    return " ".join(prev_words + new_words)
+
+def _added_words(before, text):
+    """The words `text` has past the longest word prefix it shares with `before`."""
+    old, words = before.split(), text.split()
+    shared = 0
+    while shared < min(len(old), len(words)) and old[shared] == words[shared]:
+        shared += 1
+    return " ".join(words[shared:])
+
+def _transcribe_chunk(samples):
+    from audio import asr_input, trim_silence
+    from models import get_pipeline
+
+    with stage("vad"):
+        samples, _ = trim_silence(samples)
+    if not len(samples):
+        return ""  # Whisper tends to invent words for silence
+    speech_pipeline = get_pipeline("whisper")
+    with stage("asr"):
+        return speech_pipeline(asr_input(samples))['text'].strip()
+
+def transcribe_stream(blocks, chunk_s=None, overlap_s=None):
+    """Transcribe consecutive 16 kHz blocks as they arrive; yields a Partial per chunk, the last with final=True.
+
+    Whisper runs on `chunk_s` windows that overlap by `overlap_s`, so at most
+    one window plus one block is held however long the answer runs, and the
+    transcript grows while the speaker is still talking. Blocks may be any size.
+    """
+    import numpy as np
+    from audio import SAMPLE_RATE
+
+    chunk = int((chunk_s or ASR_CHUNK_S) * SAMPLE_RATE)
+    overlap = int((ASR_CHUNK_OVERLAP_S if overlap_s is None else overlap_s) * SAMPLE_RATE)
+    if not 0 <= overlap < chunk:
+        raise ValueError("the overlap must be shorter than the chunk")
+
+    pending, buffered, text, transcribed = [], 0, "", False
+    for block in blocks:
+        pending.append(np.asarray(block, dtype=np.float32).reshape(-1))
+        buffered += len(pending[-1])
+        while buffered >= chunk:
+            window = np.concatenate(pending)
+            before, text = text, stitch(text, _transcribe_chunk(window[:chunk]))
+            transcribed = True
+            pending = [window[chunk - overlap:].copy()]
+            buffered = len(pending[0])
+            yield Partial(text, _added_words(before, text), False)
+
+    # The tail is only worth a Whisper call if it holds audio past the last overlap
+    before = text
+    if buffered > overlap or not transcribed and buffered:
+        text = stitch(text, _transcribe_chunk(np.concatenate(pending)))
+    yield Partial(text, _added_words(before, text), True)
+
+def transcribe_chunked(samples):
+    """Final transcript of a long buffer or audio file via transcribe_stream (files are decoded chunk by chunk)."""
+    from audio import iter_windows
 
-        # Normalize output
-    if isinstance(emotion_result, list):
-    # Handle nested list from top_k > 1 or default config
+    final = ""
+    for partial in transcribe_stream(window for _, window in iter_windows(samples, ASR_CHUNK_S)):
+        logger.debug("Partial transcript: %s", partial.text)
+        final = partial.text
+    return final
+
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+
+def stable_sentences(text, final=False):
+    """Sentences of a growing transcript that later chunks can no longer change.
+
+    stitch() may rewrite the last STITCH_WORDS words, so until the transcript
+    is final only sentences that end before them count; the final transcript's
+    unterminated rest counts too. Each call's list extends the previous one.
+    """
+    if not final:
+        words = text.split()
+        text = " ".join(words[:max(0, len(words) - STITCH_WORDS)])
+        ends = [m.end() for m in _SENTENCE_END.finditer(text)]
+        text = text[:ends[-1]] if ends else ""
+    sentences, start = [], 0
+    for m in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:m.end()].strip())
+        start = m.end()
+    sentences.append(text[start:].strip())
+    return [s for s in sentences if s]
+
+def transcribe_live(max_s=30.0, every_s=1.0, on_sentences=None):
+    """Record an answer (stopping at end of speech) and transcribe it while it is given; returns (text, speech ratio).
+
+    on_sentences(sentences) gets each batch of sentences as soon as they are
+    stable (see stable_sentences), so classifiers can work through the start of
+    an answer while the rest is still being spoken. The text is "" when no
+    answer was given.
+    """
+    from audio import trim_silence
+    from capture import StreamingRecorder
+
+    final, handed_out = "", 0
+    with StreamingRecorder(max_s) as recorder:
+        for partial in transcribe_stream(recorder.chunks(every_s)):
+            logger.debug("Partial transcript: %s", partial.text)
+            final = partial.text
+            if on_sentences:
+                sentences = stable_sentences(final, partial.final)
+                if len(sentences) > handed_out:
+                    on_sentences(sentences[handed_out:])
+                    handed_out = len(sentences)
+    with stage("vad"):
+        _, speech_ratio = trim_silence(recorder.samples())
+    return (final if recorder.speech_detected else ""), speech_ratio
+
+def transcribe_many(audios, vad=True):
+    """Transcribe several answers with one batched Whisper generate call; texts in input order.
+
+    Silence is trimmed first unless vad=False, and recordings without speech
+    give "" and stay out of the batch. With AUDIO_CACHE_DB set, answers already
+    transcribed are served from the cache.
+    """
+    from audio import asr_input, from_audio_data
+    from cache import memoize_audio
+    from models import get_pipeline
+
+    if not audios:
+        return []
+
+    def transcribe_batch(buffers):
+        speech_pipeline = get_pipeline("whisper")
+        inputs = [asr_input(b) for b in buffers]
+        with stage("asr"):
+            results = speech_pipeline(inputs, batch_size=len(inputs))
+        return [result['text'].strip() for result in results]
+
+    if vad:
+        buffers = [trim_answer(a)[0] for a in audios]
+    else:
+        buffers = [from_audio_data(a) if hasattr(a, "get_raw_data") else a for a in audios]
+    texts = [""] * len(buffers)
+    voiced = [i for i, b in enumerate(buffers) if len(b)]
+    if voiced:
+        for i, text in zip(voiced, memoize_audio("whisper", [buffers[i] for i in voiced], transcribe_batch)):
+            texts[i] = text
+    return texts
+
+def top_emotion_label(emotion_result, default="neutral"):
+    """Pull the top label out of a text-classification result, whatever its nesting."""
+    if isinstance(emotion_result, list) and emotion_result:
+        # Handle nested list from top_k > 1 or default config
         if isinstance(emotion_result[0], list) and len(emotion_result[0]) > 0:
-            top_emotion = emotion_result[0][0].get("label", "neutral")
+            return emotion_result[0][0].get("label", default)
         elif isinstance(emotion_result[0], dict):
-            top_emotion = emotion_result[0].get("label", "neutral")
+            return emotion_result[0].get("label", default)
+    return default
+
+def classify_emotion(text):
+    from models import get_pipeline
+
+    classifier = get_pipeline("emotion")
+    with stage("emotion"):
+        emotion_result = classifier(text)
+    logger.debug("Raw emotion_result: %s", emotion_result)
+
+    top_emotion = top_emotion_label(emotion_result)
+    logger.debug("Detected Emotion: %s", top_emotion)
+    return top_emotion
+
+def classify_emotions(texts, batch_size=32):
+    """Batch version of classify_emotion without console output; empty texts get "neutral"."""
+    from models import get_pipeline, run_batched
 
+    labels = ["neutral"] * len(texts)
+    answered = [i for i, text in enumerate(texts) if text]
+    if not answered:
+        return labels
+    get_pipeline("emotion")  # load outside the stage, as for ASR
+    with stage("emotion"):
+        results = run_batched("emotion", [texts[i] for i in answered], batch_size)
+    for i, result in zip(answered, results):
+        labels[i] = top_emotion_label([result])
+    return labels
 
-        print(f"Detected Emotion: {top_emotion}")
+def analyze_emotion_from_audio(audio_data, classify=True, vad=True):
+    """Transcribe the answer and, if `classify`, label it with the DistilBERT emotion model.
+
+    With classify=False the emotion is returned as None so the caller can derive
+    it from go-emotion scores instead (see sentiment.derive_emotion).
+    """
+    text = transcribe_audio(audio_data, vad)
+
+    if not classify:
+        return text, None
+
+    top_emotion = "neutral"  # default fallback
+    if text:
+        top_emotion = classify_emotion(text)
 
-    os.remove(file_path)
     return text, top_emotion
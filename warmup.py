@@ -0,0 +1,139 @@
+# warmup.py
+"""Load models in the background while the session introduction plays.
+
+The first answer of a session used to pay for constructing Whisper and the
+classifiers. A WarmUp loads them on a daemon thread as soon as the session
+starts and runs one throwaway inference through each, so lazy initialisation
+(kernel selection, tokenizer caches, generate config) is done too. Models are
+loaded into this process's registry, so the session then finds them through
+models.get_pipeline; if an answer arrives before a model is ready, it waits
+for that load rather than starting a second one.
+
+    warm = warmup.start(["whisper", "emotion"])
+    ...                               # play the introduction
+    print(warm.progress_line())       # ⏳ Loading models 1/2: whisper ✅  emotion ⏳
+"""
+import logging
+import os
+import threading
+import time
+
+import models
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+WARMUP = os.environ.get("WARMUP", "1") != "0"  # 0: load models on first use, as before
+DUMMY_TEXT = "I slept well and I feel ready for today's shift."
+DUMMY_AUDIO_S = 1.0
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+_MARKS = {PENDING: "⏳", LOADING: "⏳", READY: "✅", FAILED: "❌"}
+
+
+def _exercise(name, pipe):
+    """One small inference, so the first real call does not pay for lazy set-up."""
+    spec = models.MODEL_SPECS[name]
+    if spec["task"].startswith("audio") or spec["task"] == "automatic-speech-recognition":
+        import numpy as np
+        from audio import SAMPLE_RATE, asr_input
+
+        # Quiet noise rather than zeros, so nothing special-cases digital silence
+        rng = np.random.default_rng(0)
+        pipe(asr_input((rng.standard_normal(int(DUMMY_AUDIO_S * SAMPLE_RATE)) * 1e-3).astype(np.float32)))
+    else:
+        pipe([DUMMY_TEXT])
+
+
+class WarmUp:
+    """Loads and exercises `names` in order on a background thread; poll state() or wait()."""
+
+    def __init__(self, names, exercise=True, on_change=None):
+        self.names = list(dict.fromkeys(names))
+        self.exercise = exercise
+        self.on_change = on_change  # called with (name, state) from the warm-up thread
+        self.errors = {}
+        self.seconds = {}
+        self._states = {name: PENDING for name in self.names}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def _set(self, name, state):
+        with self._lock:
+            self._states[name] = state
+        if self.on_change:
+            try:
+                self.on_change(name, state)
+            except Exception:
+                logger.exception("Warm-up progress callback failed")
+
+    def _run(self):
+        try:
+            for name in self.names:
+                self._set(name, LOADING)
+                start = time.perf_counter()
+                try:
+                    pipe = models.get_pipeline(name)
+                    if self.exercise:
+                        with stage("warmup"):
+                            _exercise(name, pipe)
+                except Exception as e:
+                    # The session still works: the model is loaded again, and fails loudly, on first use
+                    logger.warning("Warm-up of %s failed: %s", name, e)
+                    self.errors[name] = f"{type(e).__name__}: {e}"
+                    self._set(name, FAILED)
+                    continue
+                self.seconds[name] = round(time.perf_counter() - start, 2)
+                self._set(name, READY)
+        finally:
+            self._done.set()
+
+    def state(self):
+        """{name: pending | loading | ready | failed}, in loading order."""
+        with self._lock:
+            return dict(self._states)
+
+    def progress(self):
+        """Fraction of the models that are finished (ready or failed)."""
+        states = self.state().values()
+        return sum(s in (READY, FAILED) for s in states) / len(states) if states else 1.0
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until every model is finished; True unless `timeout` ran out first."""
+        return self._done.wait(timeout)
+
+    def progress_line(self):
+        states = self.state()
+        done = sum(s in (READY, FAILED) for s in states.values())
+        parts = "  ".join(f"{name} {_MARKS[s]}" for name, s in states.items())
+        head = "✅ Models ready" if self.ready else f"⏳ Loading models {done}/{len(states)}"
+        return f"{head}: {parts}"
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def start(names, exercise=True, on_change=None):
+    """Start warming `names` up for this process and return the WarmUp (None when WARMUP=0)."""
+    global _current
+    if not WARMUP:
+        return None
+    with _current_lock:
+        _current = WarmUp(names, exercise, on_change).start()
+        return _current
+
+
+def current():
+    """The most recently started WarmUp, or None."""
+    return _current